@@ -0,0 +1,180 @@
+# benchmark.py
+
+import sys
+import os
+import io
+import time
+import contextlib
+import argparse
+import itertools
+import tracemalloc
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+# Ensure local import path
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+# Never hit a paid provider by accident: default to synthetic answers
+os.environ.setdefault("LLM_MODE", "synthetic")
+
+from llm_calls import extract_variables, build_answer
+from utils.rag_utils import sql_rag_call
+from server.config import client
+from utils.prompt_builder import compact_answer_messages, verbose_answer_messages, count_message_tokens
+from utils.infer_from_inputs import infer_features, match_row
+from recommend_recompute import load_model, load_layout
+
+# === Fixed Workload ===
+QUESTION = (
+    "How can I improve acoustic comfort in a 1Bed apartment in HD-Urban-V1 "
+    "with single glazing and concrete walls on the 3rd floor?"
+)
+RESULT = {
+    "comfort_score": 0.769,
+    "source": "Tier 3",
+    "compliance": {
+        "status": "❌ Not Compliant",
+        "reason": "Compared against WHO 2018",
+        "LAeq": "41.77 dB ≤ 35",
+        "RT60": "0.610619 s ≤ 0.5",
+        "LAeq_ok": False,
+        "RT60_ok": False,
+    },
+    "recommendations": {
+        "LAeq": [
+            "Since the room is on the ground floor, consider green buffers or berms to reduce street-level noise.",
+            "Add landscape elements (green walls, berms, tree buffers) to absorb external noise",
+            "Upgrade to triple-glazed or laminated acoustic windows",
+        ],
+        "RT60": [
+            "Use wall and ceiling finishes with high absorption coefficients",
+            "Concrete reflects sound — consider adding internal absorptive finishes like wood slats or acoustic felt panels.",
+            "Avoid large hard-surface areas like exposed concrete or glass",
+        ],
+    },
+    "improved_score": None,
+}
+TABLE_VECTORS = "knowledge/table_descriptions_vectors.json"
+PREDICTION_INPUT = ("2Bed", "GreenEdge-V3", "Concrete", "Single Glazing", 1)
+
+REQUEST_IDS = itertools.count()
+
+CALLS = {
+    "extract_variables": lambda: extract_variables(QUESTION),
+    "build_answer": lambda: build_answer(QUESTION, RESULT),
+    "build_answer_verbose": lambda: build_answer(QUESTION, RESULT, compact=False),
+    # Distinct questions: sql_rag_call and get_embedding memoize per question,
+    # so repeating one would only measure cache hits
+    "sql_rag_call": lambda: sql_rag_call(f"{QUESTION} (request {next(REQUEST_IDS)})", TABLE_VECTORS),
+}
+
+# === Runner ===
+def timed(fn):
+    start = time.perf_counter()
+    try:
+        fn()
+        ok = True
+    except Exception:
+        ok = False
+    return time.perf_counter() - start, ok
+
+def run_benchmark(name, requests=200, concurrency=16):
+    """
+    Fires `requests` calls of one pipeline step across `concurrency` threads.
+    """
+    fn = CALLS[name]
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(lambda _: timed(fn), range(requests)))
+    wall = time.perf_counter() - start
+    latencies = np.array([latency for latency, _ in samples])
+    return {
+        "call": name,
+        "requests": requests,
+        "errors": sum(1 for _, ok in samples if not ok),
+        "throughput_rps": requests / wall,
+        "p50_ms": np.percentile(latencies, 50) * 1000,
+        "p95_ms": np.percentile(latencies, 95) * 1000,
+    }
+
+# === Prediction Path ===
+def legacy_prediction():
+    apt, zone, wall, window, floor_level = PREDICTION_INPUT
+    features, _ = infer_features(apt, zone, element_material=f"{window} and {wall}", floor_level=floor_level)
+    return load_model().predict(pd.DataFrame([features]))[0]
+
+def fast_prediction():
+    apt, zone, wall, window, floor_level = PREDICTION_INPUT
+    row, _ = match_row(apt, zone, element_material=f"{window} and {wall}")
+    return load_layout().predict(load_model(), row, floor_level)
+
+# tracemalloc's own bookkeeping and import machinery are not request allocations
+ALLOCATION_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+def benchmark_prediction(fn, calls=500):
+    """
+    Mean latency, mean peak traced memory and allocated blocks per call for
+    one prediction path. Blocks are counted from filtered tracemalloc
+    snapshots around the timed calls, so only allocations still held when
+    a call returns (caches, buffers, leaks) are seen.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()  # warm the caches
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        latency = (time.perf_counter() - start) / calls
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot().filter_traces(ALLOCATION_FILTERS)
+        peaks = 0
+        for _ in range(calls):
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            fn()
+            peaks += tracemalloc.get_traced_memory()[1] - current
+        after = tracemalloc.take_snapshot().filter_traces(ALLOCATION_FILTERS)
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "lineno") if stat.count_diff > 0)
+    return {"latency_ms": latency * 1000, "peak_kb": peaks / calls / 1024, "blocks_per_call": blocks / calls}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the LLM pipeline steps (set LLM_MODE=replay or synthetic).")
+    parser.add_argument("--calls", nargs="+", default=list(CALLS), choices=list(CALLS))
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--prediction", action="store_true", help="Compare the DataFrame and array prediction paths instead")
+    args = parser.parse_args(argv)
+
+    if args.prediction:
+        for name, fn in (("dataframe", legacy_prediction), ("array", fast_prediction)):
+            stats = benchmark_prediction(fn, args.requests)
+            print(
+                f"🧮 {name:<10} {stats['latency_ms']:.3f} ms/call | peak {stats['peak_kb']:.1f} KiB | "
+                f"{stats['blocks_per_call']:.2f} blocks allocated/call"
+            )
+        return
+
+    print(f"🎞️ LLM mode: {os.environ['LLM_MODE']}")
+    print(
+        f"📝 build_answer prompt tokens: {count_message_tokens(verbose_answer_messages(QUESTION, RESULT))} verbose "
+        f"-> {count_message_tokens(compact_answer_messages(QUESTION, RESULT))} compact"
+    )
+    for name in args.calls:
+        stats = run_benchmark(name, args.requests, args.concurrency)
+        print(
+            f"📊 {stats['call']:<20} {stats['requests']} req | {stats['errors']} errors | "
+            f"{stats['throughput_rps']:.1f} req/s | p50 {stats['p50_ms']:.1f} ms | p95 {stats['p95_ms']:.1f} ms"
+        )
+
+    print("\n📈 Provider latency:")
+    for name, report in client.latency_report().items():
+        print(f"  {name}: {report}")
+
+if __name__ == "__main__":
+    main()
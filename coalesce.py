@@ -0,0 +1,46 @@
+# coalesce.py
+
+import sys
+import os
+import json
+
+# Ensure local import path
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from sql_calls import query_or_recommend
+from utils.single_flight import SingleFlight, canonical_input
+
+# === Shared Groups ===
+# Short TTL: long enough to absorb a dashboard refresh burst, short enough to stay fresh
+RESULT_TTL = 5.0
+
+evaluations = SingleFlight(ttl=RESULT_TTL)
+summaries = SingleFlight(ttl=RESULT_TTL)
+
+def answer_key(user_question, result):
+    question = " ".join(user_question.split()).casefold()
+    return question, json.dumps(result, sort_keys=True, default=str)
+
+def _build_answer(user_question, result):
+    # Imported lazily so evaluations work without LLM credentials
+    from llm_calls import build_answer
+    return build_answer(user_question, result)
+
+# === Coalesced Entry Points ===
+def coalesced_query_or_recommend(user_input):
+    return evaluations.do(canonical_input(user_input), query_or_recommend, user_input)
+
+def coalesced_build_answer(user_question, result):
+    return summaries.do(answer_key(user_question, result), _build_answer, user_question, result)
+
+async def aquery_or_recommend(user_input):
+    return await evaluations.ado(canonical_input(user_input), query_or_recommend, user_input)
+
+async def abuild_answer(user_question, result):
+    return await summaries.ado(answer_key(user_question, result), _build_answer, user_question, result)
+
+def coalescing_stats():
+    """
+    Counts per layer: calls, executions, coalesced (joined an in-flight call) and cache_hits.
+    """
+    return {"query_or_recommend": dict(evaluations.stats), "build_answer": dict(summaries.stats)}
@@ -1,4 +1,5 @@
 from server.config import client, completion_model
+from utils.prompt_builder import compact_answer_messages, verbose_answer_messages, DEFAULT_TOKEN_BUDGET
 import re
 
 # 🔹 Extract structured variables from free-form question
@@ -41,54 +42,15 @@ If a field is missing, omit it.
         return {}
 
 # 🔹 Summarize acoustic score + compliance + recommendations
-def build_answer(user_question: str, result: dict) -> str:
-    score = result.get("comfort_score")
-    source = result.get("source", "N/A")
-    compliance = result.get("compliance", {})
-    recommendations = result.get("recommendations", {})
-    improved_score = result.get("improved_score", None)
-
-    best_materials = result.get("best_materials", {})
-    best_score = result.get("best_score", None)
-
-    summary_prompt = f"""
-User Question:
-{user_question}
-
-📊 Evaluation Summary:
-- Comfort Score: {score}
-- Source: {source}
-- Compliance: {compliance.get("status")} — {compliance.get("reason")}
-
-🛠 Recommendations:
-{recommendations if recommendations else "None needed"}
-
-💡 Material Upgrade Suggestions:
-{best_materials if best_materials else "No upgrades suggested"}
-Improved Score: {round(best_score, 3) if best_score else "N/A"}
-"""
+def build_answer(user_question: str, result: dict, compact: bool = True, token_budget: int = DEFAULT_TOKEN_BUDGET) -> str:
+    if compact:
+        messages = compact_answer_messages(user_question, result, token_budget)
+    else:
+        messages = verbose_answer_messages(user_question, result)
 
     response = client.chat.completions.create(
         model=completion_model,
-        messages=[
-            {
-                "role": "system",
-                "content": """
-You summarize acoustic comfort evaluations for architects and sustainability consultants.
-
-Instructions:
-- Do not repeat sentences.
-- Clearly state compliance.
-- If material upgrades are provided, summarize them usefully.
-- Use bullets for clarity if needed.
-- If compliant, avoid unnecessary suggestions.
-"""
-            },
-            {
-                "role": "user",
-                "content": summary_prompt
-            }
-        ]
+        messages=messages
     )
 
-    return response.choices[0].message.content.strip()
\ No newline at end of file
+    return response.choices[0].message.content.strip()
@@ -1,15 +1,26 @@
 import sys
 import os
+import argparse
 
 # Ensure local import path
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
 from llm_calls import extract_variables, build_answer
 from sql_calls import query_or_recommend
+from utils.profiling import configure, start_profile, request_tags
 
 # === CONFIG: Choose input mode ===
 use_structured_input = True  # ⬅️ Set to True to test structured inputs directly
 
+# === Profiling (opt-in) ===
+parser = argparse.ArgumentParser(description="Run the design assistant pipeline once.")
+parser.add_argument("--profile", action="store_true", help="Profile this run, LLM calls included")
+parser.add_argument("--profile-mode", choices=["cprofile", "sample"], default=None)
+parser.add_argument("--profile-dir", default=None)
+args = parser.parse_args()
+configure(mode=args.profile_mode, directory=args.profile_dir)
+profile = start_profile(force=args.profile)
+
 # === INPUT BLOCK ===
 if use_structured_input:
     print("🟢 Using structured input...")
@@ -67,3 +78,7 @@ try:
     print("\n" + summary)
 except Exception as e:
     print(f"❌ Failed to generate summary: {e}")
+
+# === Write Profile ===
+if profile is not None:
+    print("\n🔬 Profile written:", profile.stop(request_tags(user_input, result.get("source"))))
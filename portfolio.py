@@ -0,0 +1,242 @@
+# portfolio.py
+
+import sys
+import os
+import io
+import json
+import time
+import sqlite3
+import argparse
+import contextlib
+import multiprocessing as mp
+import pandas as pd
+
+# Ensure local import path
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from sql_calls import query_or_recommend, DB_PATH
+from recommend_recompute import load_model, load_thresholds, hybrid_guidance
+from utils.infer_from_inputs import load_dataset
+from utils.guidance_retrieval import load_guidance_index
+from utils import profiling
+
+# === Output Layout ===
+MANIFEST_FILE = "_manifest.json"
+CHECKPOINT_FILE = "_completed_shards.txt"
+SUMMARY_CHECKPOINT_FILE = "_summarized_shards.txt"
+
+def part_path(out_dir, shard_id, prefix="part"):
+    return os.path.join(out_dir, f"{prefix}-{shard_id:05d}.jsonl")
+
+# === Input Loading ===
+def load_inputs(path):
+    """
+    Reads apartment configurations from a .csv or .jsonl file.
+    Each row uses the same keys as query_or_recommend's user_input.
+    """
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    df = pd.read_csv(path)
+    records = df.to_dict(orient="records")
+    # Drop empty cells so optional keys behave as if omitted
+    return [{k: v for k, v in row.items() if not pd.isna(v)} for row in records]
+
+def shard_inputs(records, shard_size):
+    return [
+        (shard_id, start, records[start:start + shard_size])
+        for shard_id, start in enumerate(range(0, len(records), shard_size))
+    ]
+
+# === Checkpointing ===
+def read_checkpoint(out_dir, name=CHECKPOINT_FILE):
+    path = os.path.join(out_dir, name)
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {int(line) for line in f if line.strip()}
+
+def mark_done(out_dir, shard_id, name=CHECKPOINT_FILE):
+    with open(os.path.join(out_dir, name), "a") as f:
+        f.write(f"{shard_id}\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def check_manifest(out_dir, manifest):
+    """
+    Refuses to resume into an output directory written with a different input or shard size.
+    """
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            previous = json.load(f)
+        if previous != manifest:
+            raise ValueError(f"{out_dir} was written for {previous}, not {manifest}. Use a new output directory.")
+    else:
+        with open(path, "w") as f:
+            json.dump(manifest, f, indent=2)
+
+def write_part(path, lines):
+    """
+    Writes a partition atomically so a crash never leaves a half-written part file.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(json.dumps(line, ensure_ascii=False, default=str) + "\n")
+    os.replace(tmp_path, path)
+
+# === Worker ===
+_worker_conn = None
+
+def warm_caches():
+    load_dataset()
+    load_thresholds()
+    index = load_guidance_index(include_thresholds=False)
+    if hybrid_guidance():
+        from utils.rag_utils import get_embeddings, embedding_model
+        index.embed_passages(get_embeddings, embedding_model)
+    try:
+        load_model()
+    except Exception as e:
+        print("⚠️ Model could not be loaded:", e)
+
+def init_worker():
+    """
+    Runs once per worker process. Caches warmed in the parent before fork are
+    inherited copy-on-write; the SQLite connection is opened per worker.
+    """
+    global _worker_conn
+    warm_caches()
+    _worker_conn = sqlite3.connect(f"file:{os.path.abspath(DB_PATH)}?mode=ro", uri=True)
+
+def score_shard(task):
+    shard_id, start, records, out_dir = task
+    lines = []
+    # Per-row pipeline logging is silenced inside workers
+    with contextlib.redirect_stdout(io.StringIO()):
+        for offset, user_input in enumerate(records):
+            line = {"row": start + offset, "input": user_input}
+            try:
+                line["result"] = query_or_recommend(user_input, conn=_worker_conn)
+            except Exception as e:
+                line["error"] = str(e)
+            lines.append(line)
+    write_part(part_path(out_dir, shard_id), lines)
+    return shard_id, len(records)
+
+# === Progress ===
+def print_progress(done, total, started):
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / rate if rate > 0 else float("inf")
+    print(f"\r⏱️ {done}/{total} rows | {rate:.1f} rows/s | ETA {eta:.0f}s", end="", flush=True)
+
+# === Stage 1: Numeric Scoring ===
+def run_portfolio(input_path, out_dir, workers=None, shard_size=500):
+    """
+    Scores every configuration in input_path across a process pool, writing one
+    part file per shard and resuming from the checkpoint if present.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    records = load_inputs(input_path)
+    check_manifest(out_dir, {
+        "input": os.path.abspath(input_path),
+        "rows": len(records),
+        "shard_size": shard_size,
+    })
+
+    done_shards = read_checkpoint(out_dir)
+    pending = [
+        (shard_id, start, shard, out_dir)
+        for shard_id, start, shard in shard_inputs(records, shard_size)
+        if shard_id not in done_shards
+    ]
+    total = sum(len(task[2]) for task in pending)
+    print(f"📦 {len(records)} rows, {len(done_shards)} shards already done, {len(pending)} to go")
+    if not pending:
+        return
+
+    # Load once in the parent so forked workers share the pages
+    warm_caches()
+    ctx = mp.get_context("fork") if "fork" in mp.get_all_start_methods() else mp.get_context()
+
+    done = 0
+    started = time.perf_counter()
+    with ctx.Pool(processes=workers, initializer=init_worker) as pool:
+        for shard_id, n_rows in pool.imap_unordered(score_shard, pending):
+            mark_done(out_dir, shard_id)
+            done += n_rows
+            print_progress(done, total, started)
+    print(f"\n✅ Results saved to: {out_dir}")
+
+# === Stage 2: Rate-limited LLM Summaries ===
+def build_question(user_input):
+    return (
+        f"Evaluate acoustic comfort and compliance for a {user_input.get('Apartment_Type')} apartment "
+        f"in {user_input.get('Zone')} with {user_input.get('wall_material')} walls and "
+        f"{user_input.get('window_material')} windows on floor {user_input.get('Floor_Level')}."
+    )
+
+def run_summaries(out_dir, requests_per_minute=30):
+    """
+    Summarizes already scored shards with build_answer, one request at a time,
+    never faster than requests_per_minute. Runs independently of scoring, so it
+    can be started after, or alongside, run_portfolio.
+    """
+    from llm_calls import build_answer
+
+    min_interval = 60.0 / requests_per_minute
+    scored = read_checkpoint(out_dir)
+    pending = sorted(scored - read_checkpoint(out_dir, SUMMARY_CHECKPOINT_FILE))
+    print(f"🧠 {len(pending)} shards to summarize at ≤{requests_per_minute} requests/min")
+
+    last_call = 0.0
+    for shard_id in pending:
+        with open(part_path(out_dir, shard_id), encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        summaries = []
+        for line in lines:
+            entry = {"row": line["row"]}
+            if "result" in line:
+                wait = min_interval - (time.perf_counter() - last_call)
+                if wait > 0:
+                    time.sleep(wait)
+                last_call = time.perf_counter()
+                try:
+                    entry["summary"] = build_answer(build_question(line["input"]), line["result"])
+                except Exception as e:
+                    entry["error"] = str(e)
+            summaries.append(entry)
+        write_part(part_path(out_dir, shard_id, prefix="summary"), summaries)
+        mark_done(out_dir, shard_id, SUMMARY_CHECKPOINT_FILE)
+        print(f"✅ Summarized shard {shard_id}")
+
+# === CLI ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate many apartment configurations with checkpointing.")
+    sub = parser.add_subparsers(dest="stage", required=True)
+
+    score = sub.add_parser("score", help="Numeric scoring across a process pool")
+    score.add_argument("input", help="Input .csv or .jsonl of user_input rows")
+    score.add_argument("out_dir", help="Directory for part files and the checkpoint")
+    score.add_argument("--workers", type=int, default=None, help="Defaults to the CPU count")
+    score.add_argument("--shard-size", type=int, default=500)
+    score.add_argument("--profile-rate", type=float, default=None, help="Fraction of rows to profile into <out_dir>/profiles")
+    score.add_argument("--profile-mode", choices=["cprofile", "sample"], default=None)
+
+    summarize = sub.add_parser("summarize", help="Rate-limited LLM summaries of scored shards")
+    summarize.add_argument("out_dir")
+    summarize.add_argument("--rpm", type=float, default=30, help="Max LLM requests per minute")
+
+    args = parser.parse_args(argv)
+    if args.stage == "score":
+        # Set before the pool forks, so workers inherit it
+        if args.profile_rate:
+            profiling.configure(rate=args.profile_rate, mode=args.profile_mode, directory=os.path.join(args.out_dir, "profiles"))
+        run_portfolio(args.input, args.out_dir, workers=args.workers, shard_size=args.shard_size)
+    else:
+        run_summaries(args.out_dir, requests_per_minute=args.rpm)
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,11 @@
 import os
 import json
 import joblib
-import pandas as pd
 import sqlite3
-from utils.infer_from_inputs import infer_features
+from functools import lru_cache
+from utils.infer_from_inputs import infer_features, match_row, fallback_features, load_dataset
+from utils.fast_predict import FeatureLayout
+from utils.guidance_retrieval import retrieve_guidance
 
 # === Paths ===
 MODEL_PATH = "model/ecoform_acoustic_comfort_model.pkl"
@@ -13,52 +15,97 @@ COMPLIANCE_JSON = "knowledge/compliance_thresholds_extended.json"
 GUIDANCE_JSON = "knowledge/compliance_guidance.json"
 DATA_PATH = "sql/Ecoform_Dataset_v1.csv"
 
+# Guidance passages kept per non-compliant metric
+GUIDANCE_RESULTS = 3
+
+# Any dataset row works for checking the fast prediction path
+SAMPLE_INPUT = ("1Bed", "HD-Urban-V0")
+
 # === Activity Thresholds ===
 activity_thresholds = {
     "Sleeping": 0.85, "Working": 0.75, "Learning": 0.80, "Living": 0.70,
     "Healing": 0.80, "Co-working": 0.75, "Exercise": 0.60, "Dining": 0.65
 }
 
+# === Cached Loaders ===
+@lru_cache(maxsize=None)
+def load_model(path=MODEL_PATH):
+    return joblib.load(path)
+
+@lru_cache(maxsize=None)
+def load_layout(path=MODEL_PATH):
+    """
+    Input layout for the cached model, checked once against the DataFrame path.
+    """
+    model = load_model(path)
+    layout = FeatureLayout(model, load_dataset())
+    features, _ = infer_features(*SAMPLE_INPUT, floor_level=1)
+    row, _ = match_row(*SAMPLE_INPUT)
+    layout.verify(model, features, row, 1)
+    return layout
+
+@lru_cache(maxsize=None)
+def hybrid_guidance():
+    """
+    True when server/config.py sets guidance_retrieval = "hybrid". Imported
+    lazily so lexical evaluations work without LLM credentials.
+    """
+    try:
+        from server.config import guidance_retrieval
+    except ImportError as e:
+        print("⚠️ server.config unavailable, using lexical guidance retrieval:", e)
+        return False
+    return guidance_retrieval == "hybrid"
+
+@lru_cache(maxsize=None)
+def load_thresholds(path=COMPLIANCE_JSON):
+    """
+    Returns compliance thresholds keyed by lowercase activity name.
+    """
+    with open(path) as f:
+        thresholds = json.load(f)
+    return {entry["use"].lower(): entry for entry in thresholds}
+
+# === Compliance Check ===
+def check_compliance(activity, laeq, rt60):
+    entry = load_thresholds().get(activity.lower())
+    if entry:
+        return {
+            "LAeq": bool(laeq <= entry["LAeq_max"]),
+            "LAeq_max": entry["LAeq_max"],
+            "RT60": bool(rt60 <= entry["RT60_max"]),
+            "RT60_max": entry["RT60_max"],
+            "source": entry["source"]
+        }
+    return {"LAeq": None, "RT60": None, "LAeq_max": None, "RT60_max": None, "source": "N/A"}
+
 # === Main Recompute Function ===
 def recommend_recompute(user_input):
-    model = joblib.load(MODEL_PATH)
+    model = load_model()
 
     COMFORT_THRESHOLD = activity_thresholds.get(user_input["activity"], 0.70)
 
-    # Infer features from dataset
-    features, tier = infer_features(
-        apartment_type=user_input["Apartment_Type"],
-        zone=user_input["Zone"],
-        element_material=f"{user_input['window_material']} and {user_input['wall_material']}",
-        floor_level=user_input.get("Floor_Level")
-    )
+    # Match a dataset row; only Tier 4 builds a feature dict
+    apartment_type = user_input["Apartment_Type"]
+    zone = user_input["Zone"]
+    element_material = f"{user_input['window_material']} and {user_input['wall_material']}"
+    row, tier = match_row(apartment_type, zone, element_material=element_material)
+    fallback = fallback_features(apartment_type, zone, element_material=element_material) if row is None else None
 
     # Predict comfort score
+    layout = load_layout()
     try:
-        X = pd.DataFrame([features])
-        comfort_score = model.predict(X)[0]
+        comfort_score = layout.predict(model, row, user_input.get("Floor_Level"), fallback)
     except:
         comfort_score = None
 
     # Compliance check
-    def check_compliance(activity, laeq, rt60):
-        with open(COMPLIANCE_JSON) as f:
-            thresholds = json.load(f)
-        for entry in thresholds:
-            if entry["use"].lower() == activity.lower():
-                return {
-                    "LAeq": laeq <= entry["LAeq_max"],
-                    "LAeq_max": entry["LAeq_max"],
-                    "RT60": rt60 <= entry["RT60_max"],
-                    "RT60_max": entry["RT60_max"],
-                    "source": entry["source"]
-                }
-        return {"LAeq": None, "RT60": None, "LAeq_max": None, "RT60_max": None, "source": "N/A"}
-
+    laeq = layout.lookup(row, "laeq_db", fallback)
+    rt60 = layout.lookup(row, "rt60_s", fallback)
     compliance = check_compliance(
         user_input["activity"],
-        features.get("laeq_db", 0),
-        features.get("rt60_s", 0)
+        laeq if laeq is not None else 0,
+        rt60 if rt60 is not None else 0
     )
 
     result = {
@@ -67,20 +114,28 @@ def recommend_recompute(user_input):
         "compliance": {
             "status": "✅ Compliant" if compliance["LAeq"] and compliance["RT60"] else "❌ Not Compliant",
             "reason": f"Compared against {compliance['source']}",
-            "LAeq": f"{features.get('laeq_db')} dB ≤ {compliance['LAeq_max']}",
-            "RT60": f"{features.get('rt60_s')} s ≤ {compliance['RT60_max']}",
+            "LAeq": f"{laeq} dB ≤ {compliance['LAeq_max']}",
+            "RT60": f"{rt60} s ≤ {compliance['RT60_max']}",
+            "LAeq_ok": compliance["LAeq"],
+            "RT60_ok": compliance["RT60"],
         },
         "recommendations": {},
         "improved_score": None
     }
 
-    # Verbose guidance
-    if not compliance["LAeq"] or not compliance["RT60"]:
-        with open(GUIDANCE_JSON) as f:
-            guidance = json.load(f)
-        if not compliance["LAeq"]:
-            result["recommendations"]["LAeq"] = guidance["LAeq_non_compliant"]["general_recommendations"]
-        if not compliance["RT60"]:
-            result["recommendations"]["RT60"] = guidance["RT60_non_compliant"]["general_recommendations"]
+    # Retrieved guidance, ranked for this non-compliance
+    for issue in ("LAeq", "RT60"):
+        if not compliance[issue]:
+            passages = retrieve_guidance(
+                issue,
+                activity=user_input["activity"],
+                wall_material=user_input.get("wall_material"),
+                window_material=user_input.get("window_material"),
+                floor_level=user_input.get("Floor_Level"),
+                n_results=GUIDANCE_RESULTS,
+                use_embeddings=hybrid_guidance(),
+                include_thresholds=False
+            )
+            result["recommendations"][issue] = [p["content"] for p in passages]
 
     return result
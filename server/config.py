@@ -1,17 +1,63 @@
+import os
 import random
+import httpx
+from functools import lru_cache
 from openai import OpenAI
 from server.keys import *
+from server.replay import RecordingClient, ReplayClient
+from server.llm_client import Provider, ResilientClient
 import sqlite3
 
 # Mode
-mode = "cloudflare"  # "local" or "openai" or "cloudflare"
+mode = os.environ.get("LLM_MODE", "cloudflare")  # "local" or "openai" or "cloudflare", or "record", "replay", "synthetic"
+
+# Record/replay settings: "record" captures calls to replay_backend,
+# "replay" serves them back and "synthetic" also answers unseen requests
+replay_backend = "cloudflare"
+replay_store = "server/llm_recordings.jsonl"
+replay_latency = os.environ.get("LLM_REPLAY_LATENCY", "fixed:0")  # or "uniform:0.05,0.4", "lognormal:-1.5,0.5"
+replay_error_rate = float(os.environ.get("LLM_REPLAY_ERROR_RATE", 0.0))
+replay_ms_per_token = float(os.environ.get("LLM_REPLAY_MS_PER_TOKEN", 0.0))
+
+# Guidance retrieval in recommend_recompute: "lexical" (BM25, no API calls) or
+# "hybrid" (also embeds the query and fuses BM25 and vector rankings with RRF)
+guidance_retrieval = os.environ.get("GUIDANCE_RETRIEVAL", "lexical")
+
+# Resilience settings (see server/llm_client.py)
+hedge_mode = None  # e.g. "local" to hedge slow chat requests to LM Studio
+request_timeout = 60.0
+provider_limits = {
+    # requests/second, burst size, max concurrent requests
+    "local": {"rate": 20, "burst": 20, "max_in_flight": 4},
+    "cloudflare": {"rate": 5, "burst": 10, "max_in_flight": 8},
+    "openai": {"rate": 10, "burst": 20, "max_in_flight": 16},
+}
+default_limits = {"rate": 1000, "burst": 1000, "max_in_flight": 64}
+
+# One pooled HTTP connection per provider; retries are handled by ResilientClient
+def pooled_http_client(max_in_flight):
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight),
+        timeout=request_timeout
+    )
 
 # API Clients
-local_client = OpenAI(base_url="http://localhost:1234/v1", api_key="lm-studio")
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+local_client = OpenAI(
+    base_url="http://localhost:1234/v1",
+    api_key="lm-studio",
+    max_retries=0,
+    http_client=pooled_http_client(provider_limits["local"]["max_in_flight"])
+)
+openai_client = OpenAI(
+    api_key=OPENAI_API_KEY,
+    max_retries=0,
+    http_client=pooled_http_client(provider_limits["openai"]["max_in_flight"])
+)
 cloudflare_client = OpenAI(
     base_url=f"https://api.cloudflare.com/client/v4/accounts/{CLOUDFLARE_ACCOUNT_ID}/ai/v1",
-    api_key=CLOUDFLARE_API_KEY
+    api_key=CLOUDFLARE_API_KEY,
+    max_retries=0,
+    http_client=pooled_http_client(provider_limits["cloudflare"]["max_in_flight"])
 )
 
 # Embedding Models
@@ -55,16 +101,52 @@ def api_mode(mode):
         completion_model = gpt4o[0]['model']
         embedding_model = openai_embedding_model
         return client, completion_model, embedding_model
+
+    elif mode == "record":
+        client, completion_model, embedding_model = api_mode(replay_backend)
+        return RecordingClient(client, replay_store), completion_model, embedding_model
+
+    elif mode in ("replay", "synthetic"):
+        _, completion_model, embedding_model = api_mode(replay_backend)
+        client = ReplayClient(
+            replay_store,
+            latency=replay_latency,
+            error_rate=replay_error_rate,
+            synthetic=(mode == "synthetic"),
+            per_token_latency=replay_ms_per_token / 1000
+        )
+        return client, completion_model, embedding_model
     else:
         raise ValueError("Please specify if you want to run local or openai models")
 
+def provider(name, client=None, completion_model=None, embedding_model=None):
+    """
+    Wraps one mode's client with its rate limit, concurrency cap and latency histogram.
+    """
+    if client is None:
+        client, completion_model, embedding_model = api_mode(name)
+    limits = provider_limits.get(replay_backend if name == "record" else name, default_limits)
+    return Provider(name, client, completion_model, embedding_model, **limits)
+
 client, completion_model, embedding_model = api_mode(mode)
+client = ResilientClient(
+    provider(mode, client, completion_model, embedding_model),
+    provider(hedge_mode) if hedge_mode and hedge_mode != mode else None
+)
 
 # === SQL Schema Utils ===
+_schema_cache = {}
+
 def get_dB_schema(db_path):
     """
     Returns a dictionary of table names and their column names from the database.
+    Cached per file and re-read only when the file's mtime changes; treat it as read-only.
     """
+    mtime = os.path.getmtime(db_path)
+    cached = _schema_cache.get(db_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
@@ -76,13 +158,18 @@ def get_dB_schema(db_path):
         columns = cursor.fetchall()
         schema[table_name] = [col[1] for col in columns]
     conn.close()
+    _schema_cache[db_path] = (mtime, schema)
     return schema
 
+@lru_cache(maxsize=64)
+def _format_schema(items):
+    context_str = ""
+    for table, columns in items:
+        context_str += f"TABLE: {table}\nCOLUMNS: {', '.join(columns)}\n\n"
+    return context_str.strip()
+
 def format_dB_context(db_path, schema_dict):
     """
     Formats schema info into a string to pass into an LLM prompt.
     """
-    context_str = ""
-    for table, columns in schema_dict.items():
-        context_str += f"TABLE: {table}\nCOLUMNS: {', '.join(columns)}\n\n"
-    return context_str.strip()
\ No newline at end of file
+    return _format_schema(tuple((table, tuple(columns)) for table, columns in schema_dict.items()))
@@ -0,0 +1,222 @@
+# server/llm_client.py
+
+import time
+import random
+import bisect
+import threading
+from collections import deque
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import openai
+
+# === Retry Policy ===
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+
+def is_retryable(error):
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+def retry_after(error):
+    """
+    Seconds requested by a Retry-After header, if the provider sent one.
+    """
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+# === Rate Limiting ===
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average, with bursts up to `burst`.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_s = (1 - self.tokens) / self.rate
+            time.sleep(wait_s)
+
+# === Latency Histogram ===
+class LatencyHistogram:
+    """
+    Cumulative bucket counts plus a sliding window of recent latencies for percentiles.
+    """
+
+    BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+    def __init__(self, window=200):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.errors = 0
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok=True):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.BUCKETS_MS, seconds * 1000)] += 1
+            if ok:
+                self.recent.append(seconds)
+            else:
+                self.errors += 1
+
+    def percentile(self, q):
+        with self._lock:
+            samples = list(self.recent)
+        return float(np.percentile(samples, q)) if samples else None
+
+    def snapshot(self):
+        labels = [f"≤{b}ms" for b in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}ms"]
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "count": sum(self.counts),
+            "errors": self.errors,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "buckets": {label: n for label, n in zip(labels, self.counts) if n},
+        }
+
+# === Provider ===
+class Provider:
+    """
+    One backend from server/config: its client (with its own pooled HTTP
+    connection), model names, rate limiter, in-flight cap and latency histogram.
+    """
+
+    def __init__(self, name, client, completion_model, embedding_model, rate=10, burst=20, max_in_flight=8):
+        self.name = name
+        self.client = client
+        self.completion_model = completion_model
+        self.embedding_model = embedding_model
+        self.bucket = TokenBucket(rate, burst)
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.latency = LatencyHistogram()
+
+    def call(self, kind, kwargs):
+        endpoint = self.client.chat.completions if kind == "chat" else self.client.embeddings
+        self.bucket.acquire()
+        with self.in_flight:
+            start = time.perf_counter()
+            try:
+                response = endpoint.create(**kwargs)
+            except Exception:
+                self.latency.record(time.perf_counter() - start, ok=False)
+                raise
+            self.latency.record(time.perf_counter() - start)
+            return response
+
+# === Resilient Client ===
+class ResilientClient:
+    """
+    Drop-in for the OpenAI client used by llm_calls and rag_utils.
+
+    Calls are rate limited and capped per provider, and retried with
+    full-jitter exponential backoff on 429, 5xx and connection errors.
+    When a secondary provider is set, a chat request still running after the
+    primary's recent p95 latency (times hedge_factor) is hedged to the
+    secondary, and the first success wins. A primary that fails outright
+    also falls over to the secondary. Embeddings are never hedged, since
+    vectors from another model would not match the stored indexes.
+    """
+
+    def __init__(self, primary, secondary=None, max_attempts=4, backoff_base=0.5, backoff_cap=8.0,
+                 hedge_factor=1.0, min_hedge_delay=1.0, min_samples=20, cold_hedge_delay=10.0):
+        self.primary = primary
+        self.secondary = secondary
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge_factor = hedge_factor
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.cold_hedge_delay = cold_hedge_delay
+        self.stats = {"retries": 0, "hedges": 0, "hedge_wins": 0, "failovers": 0}
+        self._stats_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-hedge") if secondary else None
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+        self.embeddings = SimpleNamespace(create=self._embed)
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _with_retries(self, provider, kind, kwargs):
+        for attempt in range(self.max_attempts):
+            try:
+                return provider.call(kind, kwargs)
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_attempts - 1:
+                    raise
+                self._count("retries")
+                delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                time.sleep(max(delay, retry_after(e) or 0))
+
+    def hedge_delay(self):
+        # Until there are enough samples for a p95, hedge only very slow requests
+        if len(self.primary.latency.recent) < self.min_samples:
+            return self.cold_hedge_delay
+        return max(self.min_hedge_delay, self.primary.latency.percentile(95) * self.hedge_factor)
+
+    def _secondary_kwargs(self, kwargs):
+        kwargs = dict(kwargs)
+        if kwargs.get("model") == self.primary.completion_model:
+            kwargs["model"] = self.secondary.completion_model
+        return kwargs
+
+    def _chat(self, **kwargs):
+        if self.secondary is None:
+            return self._with_retries(self.primary, "chat", kwargs)
+
+        primary = self._pool.submit(self._with_retries, self.primary, "chat", kwargs)
+        done, _ = wait([primary], timeout=self.hedge_delay())
+        if done and primary.exception() is None:
+            return primary.result()
+
+        if done:
+            self._count("failovers")
+        else:
+            self._count("hedges")
+        secondary = self._pool.submit(self._with_retries, self.secondary, "chat", self._secondary_kwargs(kwargs))
+        pending = {primary, secondary}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is secondary and not primary.done():
+                        self._count("hedge_wins")
+                    return future.result()
+        # Both failed: surface the primary's error
+        return primary.result()
+
+    def _embed(self, **kwargs):
+        return self._with_retries(self.primary, "embedding", kwargs)
+
+    def close(self):
+        """
+        Waits for abandoned hedged calls to finish and stops the hedge pool.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+    def latency_report(self):
+        providers = [self.primary] + ([self.secondary] if self.secondary else [])
+        report = {p.name: p.latency.snapshot() for p in providers}
+        report["client"] = dict(self.stats)
+        return report
@@ -0,0 +1,299 @@
+# server/replay.py
+
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import numpy as np
+import openai
+from openai.types import CreateEmbeddingResponse
+from openai.types.chat import ChatCompletion
+
+# === Defaults ===
+DEFAULT_STORE = "server/llm_recordings.jsonl"
+EMBEDDING_DIMENSIONS = 768
+
+# === Request Keys ===
+def request_key(kind, kwargs):
+    """
+    Stable hash of a chat or embedding request, used to match replays to recordings.
+    """
+    payload = json.dumps({"kind": kind, **kwargs}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def load_store(path):
+    store = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    store[entry["key"]] = entry
+    return store
+
+# === Latency Distributions ===
+def parse_latency(spec):
+    """
+    Parses a latency spec (seconds) into a sampler taking a random.Random:
+        "fixed:0.2", "uniform:0.05,0.4", "lognormal:-1.5,0.5" (mu, sigma of ln seconds)
+    """
+    kind, _, args = spec.partition(":")
+    params = [float(v) for v in args.split(",")] if args else []
+    if kind == "fixed":
+        return lambda rng: params[0] if params else 0.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(params[0], params[1])
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(params[0], params[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+def injected_error(status_code, url="http://replay.local/v1"):
+    """
+    Builds the same exception the OpenAI SDK raises for an HTTP error status.
+    """
+    response = httpx.Response(status_code, request=httpx.Request("POST", url))
+    message = f"Injected {status_code} from replay provider"
+    if status_code == 429:
+        return openai.RateLimitError(message, response=response, body=None)
+    return openai.InternalServerError(message, response=response, body=None)
+
+# === Synthetic Answers ===
+def synthetic_extraction(question):
+    """
+    Regex stand-in for extract_variables: returns a Python dict literal.
+    """
+    fields = {}
+    patterns = {
+        "Apartment_Type": r"\b(\d+Bed|Studio)\b",
+        "Zone": r"\b([A-Z][A-Za-z]+-[A-Za-z]+-V\d+|[A-Z][A-Za-z]+-V\d+)\b",
+        "wall_material": r"([A-Za-z][A-Za-z ()-]*?) walls",
+        "window_material": r"([A-Za-z][A-Za-z -]*?(?:glazing|glass))",
+        "Floor_Level": r"(\d+)(?:st|nd|rd|th)? floor|floor (\d+)",
+        "activity": r"\b(Living|Sleeping|Working|Learning|Healing|Co-working|Exercise|Dining)\b",
+    }
+    for field, pattern in patterns.items():
+        match = re.search(pattern, question, flags=re.IGNORECASE)
+        if match:
+            value = next(group for group in match.groups() if group)
+            # Keep only the last clause, e.g. "single glazing and concrete" -> "concrete"
+            value = re.split(r"\b(?:and|with)\b", value, flags=re.IGNORECASE)[-1].strip()
+            fields[field] = int(value) if field == "Floor_Level" else value
+    return repr(fields)
+
+def synthetic_chat_content(messages):
+    system = " ".join(m["content"] for m in messages if m["role"] == "system")
+    user = "\n".join(m["content"] for m in messages if m["role"] == "user")
+    if "dictionary of structured inputs" in system:
+        return synthetic_extraction(user)
+    # Summaries: echo the labelled facts from the prompt as bullets
+    facts = [line.strip(" -") for line in user.splitlines() if ":" in line and not line.strip().endswith(":")]
+    return "\n".join(f"- {fact}" for fact in facts[:6]) or "- No details provided."
+
+def synthetic_embedding(text, dimensions=EMBEDDING_DIMENSIONS):
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+def count_tokens(text):
+    return max(1, len(text) // 4)
+
+# === Endpoint Namespaces ===
+class _Endpoint:
+    def __init__(self, create):
+        self.create = create
+
+# === Record Client ===
+class RecordingClient:
+    """
+    Forwards chat and embedding calls to a live OpenAI-compatible client and
+    appends every request/response pair to a JSONL store.
+    """
+
+    def __init__(self, client, store_path=DEFAULT_STORE):
+        self.client = client
+        self.store_path = store_path
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_Endpoint(self._chat))
+        self.embeddings = _Endpoint(self._embed)
+
+    def _record(self, kind, kwargs, response):
+        entry = {
+            "key": request_key(kind, kwargs),
+            "kind": kind,
+            "request": kwargs,
+            "response": response.model_dump(mode="json"),
+        }
+        with self._lock, open(self.store_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _chat(self, **kwargs):
+        response = self.client.chat.completions.create(**kwargs)
+        self._record("chat", kwargs, response)
+        return response
+
+    def _embed(self, **kwargs):
+        response = self.client.embeddings.create(**kwargs)
+        self._record("embedding", kwargs, response)
+        return response
+
+# === Replay Client ===
+class ReplayClient:
+    """
+    Serves recorded responses with the OpenAI client interface.
+
+    Args:
+        store_path (str): JSONL store written by RecordingClient
+        latency (str): Latency distribution spec, see parse_latency
+        error_rate (float): Fraction of calls that raise an injected 429/500
+        per_token_latency (float): Extra seconds per prompt token, so prompt size shows up in latency
+        synthetic (bool): Answer unseen requests with synthetic responses instead of raising
+        seed (int): Seed for latency and error sampling
+    """
+
+    def __init__(self, store_path=DEFAULT_STORE, latency="fixed:0", error_rate=0.0, synthetic=False, seed=0, per_token_latency=0.0):
+        self.store = load_store(store_path)
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.per_token_latency = per_token_latency
+        self.synthetic = synthetic
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_Endpoint(self._chat))
+        self.embeddings = _Endpoint(self._embed)
+
+    def _simulate(self, prompt=""):
+        with self._lock:
+            delay = self.sample_latency(self._rng) + count_tokens(prompt) * self.per_token_latency
+            roll = self._rng.random()
+            status = self._rng.choice([429, 500, 503])
+        if delay > 0:
+            time.sleep(delay)
+        if roll < self.error_rate:
+            raise injected_error(status)
+
+    def _lookup(self, kind, kwargs):
+        entry = self.store.get(request_key(kind, kwargs))
+        if entry:
+            return entry["response"]
+        if not self.synthetic:
+            raise LookupError(f"No recorded {kind} response for this request. Record it first or enable synthetic mode.")
+        return None
+
+    def _chat(self, **kwargs):
+        prompt = " ".join(m["content"] for m in kwargs["messages"])
+        self._simulate(prompt)
+        response = self._lookup("chat", kwargs)
+        if response is None:
+            content = synthetic_chat_content(kwargs["messages"])
+            response = {
+                "id": "synthetic-" + request_key("chat", kwargs)[:12],
+                "object": "chat.completion",
+                "created": 0,
+                "model": kwargs.get("model", "synthetic"),
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }],
+                "usage": {
+                    "prompt_tokens": count_tokens(prompt),
+                    "completion_tokens": count_tokens(content),
+                    "total_tokens": count_tokens(prompt) + count_tokens(content),
+                },
+            }
+        return ChatCompletion.model_validate(response)
+
+    def _embed(self, **kwargs):
+        self._simulate()
+        response = self._lookup("embedding", kwargs)
+        if response is None:
+            texts = kwargs["input"] if isinstance(kwargs["input"], list) else [kwargs["input"]]
+            dimensions = kwargs.get("dimensions", EMBEDDING_DIMENSIONS)
+            tokens = sum(count_tokens(text) for text in texts)
+            response = {
+                "object": "list",
+                "model": kwargs.get("model", "synthetic"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": synthetic_embedding(text, dimensions)}
+                    for i, text in enumerate(texts)
+                ],
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            }
+        return CreateEmbeddingResponse.model_validate(response)
+
+# === Localhost Stand-in ===
+def make_handler(replay):
+    class ReplayHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            try:
+                if self.path.endswith("/chat/completions"):
+                    response = replay.chat.completions.create(**body)
+                elif self.path.endswith("/embeddings"):
+                    response = replay.embeddings.create(**body)
+                else:
+                    return self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                self._send(200, response.model_dump(mode="json"))
+            except openai.APIStatusError as e:
+                self._send(e.status_code, {"error": {"message": str(e)}})
+            except LookupError as e:
+                self._send(404, {"error": {"message": str(e)}})
+
+        def _send(self, status, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ReplayHandler
+
+def serve(replay, host="127.0.0.1", port=1235):
+    """
+    Serves a ReplayClient over HTTP at http://host:port/v1, so any OpenAI SDK
+    client (or config's local_client) can point at it.
+    """
+    httpd = ThreadingHTTPServer((host, port), make_handler(replay))
+    print(f"🎞️ Replay provider listening on http://{host}:{port}/v1")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded LLM responses on localhost.")
+    parser.add_argument("--store", default=DEFAULT_STORE)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1235)
+    parser.add_argument("--latency", default="fixed:0", help='e.g. "uniform:0.05,0.4" or "lognormal:-1.5,0.5"')
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--ms-per-token", type=float, default=0.0, help="Extra latency per prompt token")
+    parser.add_argument("--synthetic", action="store_true", help="Answer unseen requests synthetically")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    serve(
+        ReplayClient(
+            args.store,
+            latency=args.latency,
+            error_rate=args.error_rate,
+            synthetic=args.synthetic,
+            seed=args.seed,
+            per_token_latency=args.ms_per_token / 1000
+        ),
+        host=args.host,
+        port=args.port,
+    )
@@ -2,19 +2,29 @@ import sqlite3
 import pandas as pd
 import os
 from recommend_recompute import recommend_recompute
+from utils.profiling import profile_request
 
 # === Path to SQLite DB ===
 DB_PATH = "sql/comfort-database.db"
 
 # === Main SQL Call Function ===
-def query_or_recommend(user_input):
+def query_or_recommend(user_input, conn=None, profile=False):
     """
     First attempts to retrieve the acoustic comfort score from the SQL database.
     If no match is found, falls back to the ML model and recommendation pipeline.
+    Pass an open `conn` to reuse one connection across many calls.
+    Profiled when sampled at PROFILE_RATE, or when `profile` is True.
     """
-    abs_db_path = os.path.abspath(DB_PATH)
-    print(f"🔍 Using database file: {abs_db_path}")
-    conn = sqlite3.connect(abs_db_path)
+    with profile_request(user_input, force=profile) as tags:
+        result = _query_or_recommend(user_input, conn)
+        tags["tier"] = result.get("source")
+    return result
+
+def _query_or_recommend(user_input, conn=None):
+    if conn is None:
+        abs_db_path = os.path.abspath(DB_PATH)
+        print(f"🔍 Using database file: {abs_db_path}")
+        conn = sqlite3.connect(abs_db_path)
 
     # Check available columns in the table
     cursor = conn.cursor()
@@ -0,0 +1,164 @@
+# sweep.py
+
+import sys
+import os
+import time
+import argparse
+import itertools
+import numpy as np
+import pandas as pd
+
+# Ensure local import path
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from recommend_recompute import load_model, load_thresholds, activity_thresholds
+from utils.infer_from_inputs import infer_features
+
+# === Axes that can be varied in a sweep ===
+SWEEP_AXES = ["Floor_Level", "activity", "wall_material", "window_material"]
+
+# === Grid Builder ===
+def build_grid(user_input, axes):
+    """
+    Builds the cartesian product of the swept axes around a base user_input.
+
+    Args:
+        user_input (dict): Base structured input (same keys as query_or_recommend)
+        axes (dict): Axis name -> list of values, e.g. {"Floor_Level": range(1, 21)}
+
+    Returns:
+        grid (DataFrame): One row per combination, one column per input key
+    """
+    unknown = [axis for axis in axes if axis not in SWEEP_AXES]
+    if unknown:
+        raise ValueError(f"Cannot sweep over {unknown}; supported axes are {SWEEP_AXES}")
+
+    names = list(axes)
+    rows = itertools.product(*[list(axes[name]) for name in names])
+    grid = pd.DataFrame(rows, columns=names)
+    for key, val in user_input.items():
+        if key not in grid.columns:
+            grid[key] = val
+    return grid
+
+# === Main Sweep Function ===
+def run_sweep(user_input, axes):
+    """
+    Scores every combination of the swept axes with one batched model prediction
+    and one vectorized compliance pass. No SQL lookup and no LLM calls.
+
+    Returns:
+        results (DataFrame): Tidy table, one row per combination
+    """
+    grid = build_grid(user_input, axes)
+    if grid.empty:
+        return grid
+
+    # Infer features once per distinct material combination
+    combos = grid[["window_material", "wall_material"]].drop_duplicates().reset_index(drop=True)
+    rows, tiers = [], []
+    for window, wall in combos.itertuples(index=False):
+        features, tier = infer_features(
+            apartment_type=user_input["Apartment_Type"],
+            zone=user_input["Zone"],
+            element_material=f"{window} and {wall}",
+        )
+        rows.append(features)
+        tiers.append(tier)
+
+    codes = grid.merge(combos.reset_index(), on=["window_material", "wall_material"], how="left")["index"].to_numpy()
+    X = pd.DataFrame.from_records(rows).iloc[codes].reset_index(drop=True)
+
+    # Derived floor height, as in infer_features
+    if "Floor_Level" in grid.columns:
+        floors = grid["Floor_Level"].astype(float)
+        X["floor_height_m"] = (floors * 3.0).round(2)
+        X["floor_level"] = floors
+
+    # One batched prediction
+    try:
+        scores = np.round(load_model().predict(X), 3)
+    except Exception as e:
+        print("⚠️ Batched prediction failed:", e)
+        scores = np.full(len(X), np.nan)
+
+    # Vectorized compliance
+    thresholds = load_thresholds()
+    activity = grid["activity"].str.lower()
+    laeq_max = activity.map(lambda a: thresholds.get(a, {}).get("LAeq_max")).astype(float)
+    rt60_max = activity.map(lambda a: thresholds.get(a, {}).get("RT60_max")).astype(float)
+    laeq = X["laeq_db"].astype(float)
+    rt60 = X["rt60_s"].astype(float)
+    comfort_thresholds = {name.lower(): value for name, value in activity_thresholds.items()}
+    comfort_threshold = activity.map(comfort_thresholds).fillna(0.70)
+
+    results = grid[[c for c in SWEEP_AXES if c in grid.columns]].copy()
+    results["tier"] = [tiers[i] for i in codes]
+    results["comfort_score"] = scores
+    results["comfort_threshold"] = comfort_threshold
+    results["meets_comfort"] = results["comfort_score"] >= comfort_threshold
+    results["laeq_db"] = laeq
+    results["LAeq_max"] = laeq_max
+    results["LAeq_ok"] = laeq <= laeq_max
+    results["rt60_s"] = rt60
+    results["RT60_max"] = rt60_max
+    results["RT60_ok"] = rt60 <= rt60_max
+    results["compliant"] = results["LAeq_ok"] & results["RT60_ok"]
+    return results
+
+# === CLI ===
+def parse_range(text):
+    """
+    Parses "1:20" (inclusive) or "1,3,5" into a list of ints.
+    """
+    if ":" in text:
+        start, stop = text.split(":")
+        return list(range(int(start), int(stop) + 1))
+    return [int(v) for v in text.split(",")]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="What-if parameter sweep over one base apartment configuration.")
+    parser.add_argument("--apartment-type", required=True)
+    parser.add_argument("--zone", required=True)
+    parser.add_argument("--wall", required=True, help="Base wall material")
+    parser.add_argument("--window", required=True, help="Base window material")
+    parser.add_argument("--floor", type=int, default=1, help="Base floor level")
+    parser.add_argument("--activity", default="Living", help="Base activity")
+    parser.add_argument("--floors", type=parse_range, help='Floor_Level axis, e.g. "1:20" or "1,5,10"')
+    parser.add_argument("--activities", nargs="+", help="activity axis")
+    parser.add_argument("--walls", nargs="+", help="wall_material axis")
+    parser.add_argument("--windows", nargs="+", help="window_material axis")
+    parser.add_argument("--out", help="Write the result table to this CSV file")
+    args = parser.parse_args(argv)
+
+    user_input = {
+        "Apartment_Type": args.apartment_type,
+        "Zone": args.zone,
+        "wall_material": args.wall,
+        "window_material": args.window,
+        "Floor_Level": args.floor,
+        "activity": args.activity,
+    }
+    axes = {}
+    if args.floors:
+        axes["Floor_Level"] = args.floors
+    if args.activities:
+        axes["activity"] = args.activities
+    if args.walls:
+        axes["wall_material"] = args.walls
+    if args.windows:
+        axes["window_material"] = args.windows
+
+    start = time.perf_counter()
+    results = run_sweep(user_input, axes)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Swept {len(results)} combinations in {elapsed:.3f}s")
+
+    if args.out:
+        results.to_csv(args.out, index=False)
+        print(f"💾 Results saved to: {args.out}")
+    else:
+        print(results.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
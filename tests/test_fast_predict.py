@@ -0,0 +1,92 @@
+# tests/test_fast_predict.py
+# Run with `python tests/test_fast_predict.py` or `python -m pytest tests`.
+
+import sys
+import os
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # dataset paths are relative to the project root
+
+from utils.infer_from_inputs import infer_features, match_row, load_dataset
+from utils.fast_predict import FeatureLayout
+
+MODEL_PATH = "model/ecoform_acoustic_comfort_model.pkl"
+TARGET = "comfort_index_float"
+
+# (apartment, zone, element, material, expected tier)
+INPUTS = [
+    ("1Bed", "HD-Urban-V0", "Terrazzo", "Concrete Block", "Tier 1"),
+    ("1Bed", "HD-Urban-V0", "no such element", "Concrete Block", "Tier 2"),
+    ("2Bed", "GreenEdge-V3", None, "no such material", "Tier 3"),
+]
+FLOOR_LEVELS = [None, 0, 1, 7]
+
+def small_model():
+    """
+    Same shape as scripts/train_model_v1.py, with fewer trees, so the test
+    does not depend on the (uncommitted) trained model.
+    """
+    df = load_dataset()
+    X = df.drop(columns=[TARGET])
+    categorical = X.select_dtypes(include=["object", "string"]).columns.tolist()
+    numeric = X.select_dtypes(exclude=["object", "string"]).columns.tolist()
+    preprocessor = ColumnTransformer([
+        ("cat", OneHotEncoder(handle_unknown="ignore"), categorical),
+        ("num", StandardScaler(), numeric),
+    ])
+    pipeline = Pipeline([
+        ("preprocessor", preprocessor),
+        ("regressor", RandomForestRegressor(n_estimators=5, random_state=42)),
+    ])
+    return pipeline.fit(X, df[TARGET])
+
+def assert_paths_agree(model):
+    layout = FeatureLayout(model, load_dataset())
+    assert layout.plan is not None
+    for apartment, zone, element, material, expected_tier in INPUTS:
+        for floor_level in FLOOR_LEVELS:
+            with contextlib.redirect_stdout(io.StringIO()):
+                features, tier = infer_features(apartment, zone, element, material, floor_level)
+                row, _ = match_row(apartment, zone, element, material)
+            assert tier == expected_tier
+            expected = model.predict(pd.DataFrame([features]))[0]
+            assert np.isclose(layout.predict(model, row, floor_level), expected), (tier, floor_level)
+
+def test_array_path_matches_dataframe_path():
+    assert_paths_agree(small_model())
+
+def test_array_path_matches_trained_model():
+    if not os.path.exists(MODEL_PATH):
+        print("⚠️ No trained model, skipping (run scripts/train_model_v1.py)")
+        return
+    assert_paths_agree(joblib.load(MODEL_PATH))
+
+def test_verify_falls_back_on_mismatch():
+    model = small_model()
+    layout = FeatureLayout(model, load_dataset())
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        features, _ = infer_features("1Bed", "HD-Urban-V0", floor_level=1)
+        row, _ = match_row("1Bed", "HD-Urban-V0")
+        # A row that is not the one the features came from
+        layout.verify(model, features, row + 1, 1)
+    assert layout.plan is None
+    assert "Fast prediction path disabled" in out.getvalue()
+    # The DataFrame fallback still predicts the features' own row
+    assert np.isclose(layout.predict(model, row, 1), model.predict(pd.DataFrame([features]))[0])
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print("✅", name)
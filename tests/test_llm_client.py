@@ -0,0 +1,232 @@
+# tests/test_llm_client.py
+# Run with `python tests/test_llm_client.py` or `python -m pytest tests`.
+
+import sys
+import os
+import time
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import openai
+from openai import OpenAI
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from server.llm_client import Provider, ResilientClient
+from server.replay import ReplayClient, make_handler
+
+MESSAGES = [{"role": "user", "content": "Comfort Score: 0.8"}]
+
+class FakeClient:
+    """
+    In-process OpenAI-shaped client that records call times and concurrency,
+    and raises the queued errors first.
+    """
+
+    def __init__(self, delay=0.0, errors=()):
+        self.delay = delay
+        self.errors = list(errors)
+        self.active = 0
+        self.max_active = 0
+        self.calls = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.embeddings = SimpleNamespace(create=self._create)
+
+    def _create(self, **kwargs):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.calls.append(time.monotonic())
+            error = self.errors.pop(0) if self.errors else None
+        try:
+            time.sleep(self.delay)
+            if error:
+                raise error
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))])
+        finally:
+            with self._lock:
+                self.active -= 1
+
+def provider(name, client, rate=1000, burst=1000, max_in_flight=64):
+    return Provider(name, client, f"{name}-model", f"{name}-embed", rate=rate, burst=burst, max_in_flight=max_in_flight)
+
+def replay(latency="fixed:0", error_rate=0.0, seed=0):
+    return ReplayClient(latency=latency, error_rate=error_rate, synthetic=True, seed=seed)
+
+def chat(client, i=0):
+    return client.chat.completions.create(model="primary-model", messages=MESSAGES + [{"role": "user", "content": f"id: {i}"}])
+
+def bad_request():
+    response = httpx.Response(400, request=httpx.Request("POST", "http://fake.local/v1"))
+    return openai.BadRequestError("bad request", response=response, body=None)
+
+@contextmanager
+def replay_server(fake):
+    """
+    Serves a ReplayClient on a free localhost port; yields the port.
+    """
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(fake))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield httpd.server_address[1]
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        thread.join()
+
+def _raised(fn, *args):
+    try:
+        fn(*args)
+    except Exception as e:
+        return e
+    return None
+
+# === Retries ===
+def test_injected_errors_are_retried():
+    client = ResilientClient(provider("primary", replay(error_rate=0.3, seed=3)), max_attempts=8, backoff_base=0.001)
+    responses = [chat(client, i) for i in range(40)]
+    report = client.latency_report()
+
+    assert all(r.choices[0].message.content for r in responses)
+    assert client.stats["retries"] > 0
+    # Every failed attempt was retried, and every attempt was recorded
+    assert report["primary"]["errors"] == client.stats["retries"]
+    assert report["primary"]["count"] == 40 + client.stats["retries"]
+
+def test_exhausted_retries_raise_the_last_error():
+    client = ResilientClient(provider("primary", replay(error_rate=1.0)), max_attempts=3, backoff_base=0.001)
+    error = _raised(chat, client)
+    assert isinstance(error, (openai.RateLimitError, openai.InternalServerError))
+    assert client.stats["retries"] == 2
+    assert client.latency_report()["primary"]["errors"] == 3
+
+def test_non_retryable_error_is_raised_at_once():
+    fake = FakeClient(errors=[bad_request()])
+    client = ResilientClient(provider("primary", fake), backoff_base=0.001)
+    assert isinstance(_raised(chat, client), openai.BadRequestError)
+    assert client.stats["retries"] == 0
+    assert len(fake.calls) == 1
+    assert client.latency_report()["primary"]["errors"] == 1
+
+# === Hedging and Failover ===
+def test_slow_primary_is_hedged_and_secondary_wins():
+    client = ResilientClient(provider("primary", replay(latency="fixed:0.5")), provider("secondary", replay(latency="fixed:0.01")),
+                             cold_hedge_delay=0.05, min_samples=1000)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        list(pool.map(lambda i: chat(client, i), range(10)))
+    assert time.perf_counter() - started < 0.4
+
+    assert client.stats["hedges"] == 10
+    assert client.stats["hedge_wins"] == 10
+    assert client.stats["failovers"] == 0
+    client.close()  # waits for the abandoned primary calls
+    report = client.latency_report()
+    assert report["primary"]["count"] == 10 and report["secondary"]["count"] == 10
+
+def test_fast_primary_is_not_hedged():
+    secondary = FakeClient()
+    client = ResilientClient(provider("primary", replay(latency="fixed:0.01")), provider("secondary", secondary),
+                             cold_hedge_delay=0.5, min_samples=1000)
+    for i in range(10):
+        chat(client, i)
+    assert client.stats == {"retries": 0, "hedges": 0, "hedge_wins": 0, "failovers": 0}
+    assert secondary.calls == []
+
+def test_hedge_delay_follows_primary_p95():
+    client = ResilientClient(provider("primary", replay(latency="fixed:0.02")), provider("secondary", FakeClient()),
+                             min_hedge_delay=0.001, min_samples=5, cold_hedge_delay=10.0)
+    assert client.hedge_delay() == 10.0
+    for i in range(5):
+        chat(client, i)
+    assert 0.015 < client.hedge_delay() < 0.2
+
+def test_failed_primary_fails_over():
+    client = ResilientClient(provider("primary", replay(error_rate=1.0)), provider("secondary", replay()),
+                             max_attempts=1, cold_hedge_delay=5.0)
+    for i in range(5):
+        assert chat(client, i).choices[0].message.content
+    assert client.stats["failovers"] == 5 and client.stats["hedges"] == 0
+    report = client.latency_report()
+    assert report["primary"]["errors"] == 5 and report["secondary"]["count"] == 5
+
+def test_embeddings_are_never_hedged():
+    secondary = FakeClient()
+    client = ResilientClient(provider("primary", replay(latency="fixed:0.2")), provider("secondary", secondary),
+                             cold_hedge_delay=0.01, min_samples=1000)
+    response = client.embeddings.create(model="primary-embed", input=["wall"])
+    assert len(response.data) == 1
+    assert client.stats["hedges"] == 0 and secondary.calls == []
+
+# === Rate and Concurrency Limits ===
+def test_token_bucket_caps_request_rate():
+    fake = FakeClient()
+    client = ResilientClient(provider("primary", fake, rate=20, burst=5))
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: chat(client, i), range(25)))
+    elapsed = time.perf_counter() - started
+
+    # 5 requests from the burst, then 20 more at 20/s
+    assert elapsed >= 0.9
+    # No one-second window holds more than burst + rate calls
+    calls = sorted(fake.calls)
+    assert all(sum(1 for t in calls if start <= t < start + 1.0) <= 25 for start in calls)
+    assert sum(1 for t in calls if t < calls[0] + 0.5) <= 5 + 0.5 * 20 + 1
+
+def test_in_flight_cap_limits_concurrency():
+    fake = FakeClient(delay=0.05)
+    client = ResilientClient(provider("primary", fake, max_in_flight=3))
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        list(pool.map(lambda i: chat(client, i), range(24)))
+    assert fake.max_active == 3
+    assert client.latency_report()["primary"]["count"] == 24
+
+# === End to End over HTTP ===
+def test_flaky_slow_primary_over_http():
+    # Slow, flaky primary and a fast secondary, both OpenAI-compatible on localhost
+    primary_fake = ReplayClient(latency="uniform:0.05,2.0", error_rate=0.2, synthetic=True, seed=1)
+    secondary_fake = ReplayClient(latency="fixed:0.05", synthetic=True, seed=2)
+
+    def http_provider(name, port):
+        client = OpenAI(
+            base_url=f"http://127.0.0.1:{port}/v1",
+            api_key="fake",
+            max_retries=0,
+            http_client=httpx.Client(limits=httpx.Limits(max_connections=16, max_keepalive_connections=16), timeout=30),
+        )
+        return Provider(name, client, f"{name}-model", f"{name}-embed", rate=50, burst=50, max_in_flight=8)
+
+    with replay_server(primary_fake) as primary_port, replay_server(secondary_fake) as secondary_port:
+        client = ResilientClient(http_provider("primary", primary_port), http_provider("secondary", secondary_port),
+                                 backoff_base=0.05, min_hedge_delay=0.2, min_samples=10)
+        try:
+            with ThreadPoolExecutor(max_workers=16) as pool:
+                responses = list(pool.map(lambda i: chat(client, i), range(100)))
+        finally:
+            client.close()  # waits for the abandoned calls before the servers stop
+            for backend in (client.primary, client.secondary):
+                backend.client.close()
+
+    assert all(r.choices[0].message.content for r in responses)
+    stats = client.stats
+    assert stats["retries"] > 0
+    assert stats["hedges"] > 0 and 0 < stats["hedge_wins"] <= stats["hedges"]
+    report = client.latency_report()
+    assert report["primary"]["errors"] > 0
+    assert report["secondary"]["errors"] == 0
+    # Every hedge or failover made exactly one (never failing) secondary call
+    assert report["secondary"]["count"] == stats["hedges"] + stats["failovers"]
+    assert report["secondary"]["p95_ms"] < report["primary"]["p95_ms"]
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print("✅", name)
@@ -0,0 +1,178 @@
+# tests/test_single_flight.py
+# Run with `python tests/test_single_flight.py` or `python -m pytest tests`.
+
+import sys
+import os
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import coalesce
+from utils.single_flight import SingleFlight, canonical_input
+
+# Same configuration, different casing and number type
+VARIANTS = [
+    {"Apartment_Type": "2Bed", "Zone": "GreenEdge-V3", "Floor_Level": 1, "activity": "Sleeping"},
+    {"Apartment_Type": "2bed", "Zone": "greenedge-v3", "Floor_Level": 1.0, "activity": "SLEEPING"},
+]
+
+class SlowEvaluation:
+    """
+    Stand-in for query_or_recommend that records every execution.
+    """
+
+    def __init__(self, delay=0.2, error=None):
+        self.delay = delay
+        self.error = error
+        self.runs = []
+        self._lock = threading.Lock()
+
+    def __call__(self, user_input, conn=None):
+        with self._lock:
+            self.runs.append(user_input)
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return {"comfort_score": 0.8, "source": "Tier 1"}
+
+def burst_threads(fn, n=64):
+    start_line = threading.Barrier(n)
+
+    def request(i):
+        start_line.wait()
+        return fn(i)
+
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        return list(pool.map(request, range(n)))
+
+@contextmanager
+def patched_coalesce(evaluation, ttl):
+    """
+    Swaps in a stand-in evaluation and fresh groups, restoring them afterwards.
+    """
+    saved = coalesce.query_or_recommend, coalesce.evaluations, coalesce.summaries
+    coalesce.query_or_recommend = evaluation
+    coalesce.evaluations = SingleFlight(ttl=ttl)
+    coalesce.summaries = SingleFlight(ttl=ttl)
+    try:
+        yield
+    finally:
+        coalesce.query_or_recommend, coalesce.evaluations, coalesce.summaries = saved
+
+# === SingleFlight ===
+def test_threads_share_one_execution():
+    # ttl=0 so only in-flight sharing, not the cache, can explain a single run
+    group, evaluation = SingleFlight(ttl=0), SlowEvaluation()
+    results = burst_threads(lambda i: group.do(canonical_input(VARIANTS[i % 2]), evaluation, VARIANTS[i % 2]))
+    assert len(evaluation.runs) == 1
+    assert all(r == {"comfort_score": 0.8, "source": "Tier 1"} for r in results)
+    assert group.stats == {"calls": 64, "executions": 1, "coalesced": 63, "cache_hits": 0}
+
+def test_callers_get_independent_copies():
+    group, evaluation = SingleFlight(ttl=0), SlowEvaluation()
+    results = burst_threads(lambda i: group.do("key", evaluation, VARIANTS[0]), n=8)
+    results[0]["comfort_score"] = None
+    assert results[1]["comfort_score"] == 0.8
+
+def test_errors_reach_every_caller():
+    group, evaluation = SingleFlight(ttl=5), SlowEvaluation(error=ValueError("no match"))
+    errors = burst_threads(lambda i: _raised(group.do, "key", evaluation, VARIANTS[0]), n=16)
+    assert len(evaluation.runs) == 1
+    assert all(isinstance(e, ValueError) for e in errors)
+    # Failures are not cached
+    _raised(group.do, "key", evaluation, VARIANTS[0])
+    assert len(evaluation.runs) == 2
+
+def test_asyncio_tasks_share_one_execution():
+    group, evaluation = SingleFlight(ttl=0), SlowEvaluation()
+
+    async def burst():
+        return await asyncio.gather(*[group.ado(canonical_input(v), evaluation, v) for v in VARIANTS * 32])
+
+    results = asyncio.run(burst())
+    assert len(evaluation.runs) == 1
+    assert len(results) == 64 and group.stats["coalesced"] == 63
+
+def test_cancelled_leader_does_not_fail_followers():
+    group, evaluation = SingleFlight(ttl=0), SlowEvaluation()
+
+    async def scenario():
+        leader = asyncio.create_task(group.ado("key", evaluation, VARIANTS[0]))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(group.ado("key", evaluation, VARIANTS[0]))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        result = await follower
+        assert leader.cancelled()
+        return result
+
+    assert asyncio.run(scenario()) == {"comfort_score": 0.8, "source": "Tier 1"}
+    assert len(evaluation.runs) == 1
+
+def test_interrupted_thread_leader_lets_followers_retry():
+    group = SingleFlight(ttl=0)
+    started, runs = threading.Event(), []
+
+    def interrupted():
+        runs.append("leader")
+        started.set()
+        time.sleep(0.1)
+        raise KeyboardInterrupt
+
+    def evaluation():
+        runs.append("retry")
+        return "ok"
+
+    leader = threading.Thread(target=lambda: _raised(group.do, "key", interrupted))
+    leader.start()
+    started.wait()
+    assert group.do("key", evaluation) == "ok"
+    leader.join()
+    assert runs == ["leader", "retry"]
+
+# === coalesce.py Wrappers ===
+def test_coalesced_query_or_recommend_and_cache():
+    evaluation = SlowEvaluation(delay=0.1)
+    with patched_coalesce(evaluation, ttl=0.3):
+        burst_threads(lambda i: coalesce.coalesced_query_or_recommend(VARIANTS[i % 2]), n=16)
+        assert len(evaluation.runs) == 1
+
+        # Within the TTL: served from the cache
+        coalesce.coalesced_query_or_recommend(VARIANTS[1])
+        assert len(evaluation.runs) == 1
+
+        # After the TTL: recomputed
+        time.sleep(0.35)
+        coalesce.coalesced_query_or_recommend(VARIANTS[0])
+        assert len(evaluation.runs) == 2
+
+        stats = coalesce.coalescing_stats()["query_or_recommend"]
+        assert stats == {"calls": 18, "executions": 2, "coalesced": 15, "cache_hits": 1}
+
+def test_aquery_or_recommend():
+    evaluation = SlowEvaluation(delay=0.1)
+    with patched_coalesce(evaluation, ttl=5):
+        async def burst():
+            return await asyncio.gather(*[coalesce.aquery_or_recommend(v) for v in VARIANTS * 8])
+
+        results = asyncio.run(burst())
+        assert len(evaluation.runs) == 1 and len(results) == 16
+        asyncio.run(coalesce.aquery_or_recommend(VARIANTS[0]))
+        assert coalesce.coalescing_stats()["query_or_recommend"]["cache_hits"] == 1
+
+def _raised(fn, *args):
+    try:
+        fn(*args)
+    except BaseException as e:
+        return e
+    return None
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print("✅", name)
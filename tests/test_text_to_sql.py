@@ -0,0 +1,92 @@
+# tests/test_text_to_sql.py
+# Run with `python tests/test_text_to_sql.py` or `python -m pytest tests`.
+# Needs server/keys.py (created locally, see readme); no LLM calls are made.
+
+import sys
+import os
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # database paths are relative to the project root
+
+import text_to_sql
+from text_to_sql import templatize, validate_sql, cached_sql, remember_sql
+
+def _raised(fn, *args):
+    try:
+        fn(*args)
+    except Exception as e:
+        return e
+    return None
+
+# === Templates ===
+def test_parameters_are_named_by_column_and_kind():
+    template, params, hints = templatize("Compare HD-Urban-V0 and GreenEdge-V3 for 1Bed, floors 2 and 4.5?")
+    assert template == (
+        "compare :zone_string_0 and :zone_string_1 for :apartment_type_string_0, "
+        "floors :number_0 and :number_1"
+    )
+    assert params == {
+        "zone_string_0": "HD-Urban-V0", "zone_string_1": "GreenEdge-V3",
+        "apartment_type_string_0": "1Bed", "number_0": 2, "number_1": 4.5,
+    }
+    assert hints["zone_string_0"] == "text value of comfort_lookup.zone_string"
+    assert hints["number_1"] == "number"
+
+def test_same_shape_questions_share_a_template():
+    first = templatize("What is the LAeq limit for Sleeping in GreenEdge-V3 on floor 3?")
+    second = templatize("what is the  laeq limit for LIVING in hd-urban-v0 on floor 12")
+    assert first[0] == second[0] == "what is the laeq limit for :use_0 in :zone_string_0 on floor :number_0"
+    assert first[1] == {"use_0": "Sleeping", "zone_string_0": "GreenEdge-V3", "number_0": 3}
+    assert second[1] == {"use_0": "Living", "zone_string_0": "HD-Urban-V0", "number_0": 12}
+
+def test_literals_bound_to_other_columns_do_not_share_a_template():
+    by_zone, _, _ = templatize("Average comfort in GreenEdge-V3")
+    by_type, _, _ = templatize("Average comfort in 2Bed")
+    assert by_zone != by_type
+
+# === Validation ===
+def test_validate_sql_rejects_non_select_statements():
+    for sql in [
+        "DELETE FROM comfort_lookup",
+        "INSERT INTO comfort_lookup (zone_string) VALUES ('x')",
+        "UPDATE comfort_lookup SET zone_string = 'x'",
+        "DROP TABLE comfort_lookup",
+        "SELECT 1; DROP TABLE comfort_lookup",
+    ]:
+        error = _raised(validate_sql, sql, {})
+        assert isinstance(error, ValueError) and "single SELECT" in str(error), sql
+
+def test_validate_sql_rejects_unplannable_select():
+    error = _raised(validate_sql, "SELECT * FROM no_such_table", {})
+    assert isinstance(error, ValueError) and "no such table" in str(error)
+
+def test_validate_sql_accepts_bound_select():
+    sql = "SELECT comfort_index_float FROM comfort_lookup WHERE zone_string = :zone_string_0"
+    assert validate_sql(sql, {"zone_string_0": "GreenEdge-V3"}) is None
+
+# === SQL Cache ===
+def test_sql_cache_is_bounded():
+    saved = text_to_sql.SQL_CACHE_ENTRIES, dict(text_to_sql._sql_cache)
+    text_to_sql.SQL_CACHE_ENTRIES = 3
+    text_to_sql._sql_cache.clear()
+    try:
+        remember_sql(("old", (1,)), "SELECT 0")
+        for i in range(3):
+            remember_sql((f"t{i}", (2,)), f"SELECT {i}")
+        # Entries for older database versions go first, then the oldest
+        assert cached_sql(("old", (1,))) is None
+        remember_sql(("t3", (2,)), "SELECT 3")
+        assert cached_sql(("t0", (2,))) is None
+        assert [cached_sql((f"t{i}", (2,))) for i in (1, 2, 3)] == ["SELECT 1", "SELECT 2", "SELECT 3"]
+        assert len(text_to_sql._sql_cache) == 3
+    finally:
+        text_to_sql.SQL_CACHE_ENTRIES = saved[0]
+        text_to_sql._sql_cache.clear()
+        text_to_sql._sql_cache.update(saved[1])
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print("✅", name)
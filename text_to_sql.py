@@ -0,0 +1,261 @@
+# text_to_sql.py
+
+import sys
+import os
+import re
+import time
+import sqlite3
+import argparse
+import threading
+from collections import Counter
+
+# Ensure local import path
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from server.config import client, completion_model, get_dB_schema, format_dB_context
+from utils.rag_utils import sql_rag_call
+
+# === Databases ===
+# Attached into one read-only connection; table names are unique across files
+DATABASES = {
+    "main": "sql/comfort-database.db",
+    "compliance": "sql/compliance-database.db",
+    "material": "sql/material-database.db",
+}
+TABLE_VECTORS = "knowledge/table_descriptions_vectors.json"
+
+# Text columns whose values are treated as literals in questions
+VOCABULARY_COLUMNS = [
+    ("main", "comfort_lookup", "zone_string"),
+    ("main", "comfort_lookup", "apartment_type_string"),
+    ("main", "comfort_lookup", "period"),
+    ("compliance", "compliance_thresholds", "use"),
+    ("material", "material_knowledge", "material"),
+    ("main", "comfort_lookup", "wall_material"),
+    ("main", "comfort_lookup", "window_material"),
+]
+
+# === Execution Limits ===
+MAX_ROWS = 200
+TIME_LIMIT_S = 2.0
+DEBUG_ATTEMPTS = 1
+
+# Generated SQL kept per question template
+SQL_CACHE_ENTRIES = 1024
+
+SYSTEM_PROMPT = """
+You write SQLite queries for an acoustic comfort database.
+Use only the tables and columns below.
+The question contains named parameters such as :use_0 or :number_0, named
+after the column or kind of value they stand for. Use them as bound
+parameters exactly as written; never inline values for them.
+Return a single SELECT statement and nothing else.
+
+{schema}
+"""
+
+# === Read-only Connections ===
+_local = threading.local()
+
+def db_versions():
+    return tuple(os.path.getmtime(path) for path in DATABASES.values())
+
+def get_connection():
+    """
+    One read-only connection per thread with every database attached.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        uris = {alias: f"file:{os.path.abspath(path)}?mode=ro" for alias, path in DATABASES.items()}
+        conn = sqlite3.connect(uris["main"], uri=True, check_same_thread=False)
+        for alias, uri in uris.items():
+            if alias != "main":
+                conn.execute("ATTACH DATABASE ? AS " + alias, (uri,))
+        _local.conn = conn
+    return conn
+
+def run_limited(sql, params, max_rows=MAX_ROWS, time_limit=TIME_LIMIT_S):
+    """
+    Executes a statement with a wall-clock limit and returns at most max_rows rows.
+    """
+    conn = get_connection()
+    deadline = time.monotonic() + time_limit
+    conn.set_progress_handler(lambda: int(time.monotonic() > deadline), 1000)
+    try:
+        cursor = conn.execute(sql, params)
+        columns = [d[0] for d in cursor.description] if cursor.description else []
+        return columns, cursor.fetchmany(max_rows)
+    finally:
+        conn.set_progress_handler(None, 0)
+
+# === Question Templates ===
+_vocabulary = {}
+
+def get_vocabulary():
+    """
+    Known text values -> (canonical value, source column), longest first.
+    Rebuilt when any database file changes.
+    """
+    versions = db_versions()
+    if _vocabulary.get("versions") != versions:
+        conn = get_connection()
+        values = {}
+        for alias, table, column in VOCABULARY_COLUMNS:
+            for (value,) in conn.execute(f'SELECT DISTINCT "{column}" FROM {alias}.{table} WHERE "{column}" IS NOT NULL'):
+                values.setdefault(str(value).lower(), (value, f"{table}.{column}"))
+        _vocabulary["versions"] = versions
+        _vocabulary["values"] = sorted(values.items(), key=lambda item: -len(item[0]))
+    return _vocabulary["values"]
+
+def templatize(question):
+    """
+    Replaces literals (known database values, then numbers) with parameters
+    named after their column or kind, e.g. :zone_string_0, :use_0, :number_0,
+    numbered per kind in order of appearance. The names are part of the
+    template, so questions only share SQL when each literal binds to the
+    same column.
+
+    Returns:
+        template (str): Normalized question shape, the cache key
+        params (dict): Parameter name -> bound value
+        hints (dict): Parameter name -> what kind of value it is
+    """
+    text = " ".join(question.split())
+    spans = []
+
+    def free(start, end):
+        return all(end <= s or start >= e for s, e, _, _, _ in spans)
+
+    for lowered, (value, column) in get_vocabulary():
+        pattern = r"(?<![\w-])" + re.escape(lowered) + r"(?![\w-])"
+        for match in re.finditer(pattern, text, re.IGNORECASE):
+            if free(*match.span()):
+                spans.append((*match.span(), value, column.split(".")[-1], f"text value of {column}"))
+    for match in re.finditer(r"(?<![\w.])\d+(?:\.\d+)?(?![\w.])", text):
+        if free(*match.span()):
+            raw = match.group(0)
+            spans.append((*match.span(), float(raw) if "." in raw else int(raw), "number", "number"))
+
+    params, hints, pieces, cursor = {}, {}, [], 0
+    counts = Counter()
+    for start, end, value, kind, hint in sorted(spans):
+        name = f"{kind}_{counts[kind]}"
+        counts[kind] += 1
+        params[name], hints[name] = value, hint
+        pieces += [text[cursor:start], f":{name}"]
+        cursor = end
+    pieces.append(text[cursor:])
+    template = "".join(pieces).lower().rstrip("?.! ")
+    return template, params, hints
+
+# === SQL Cache ===
+# (template, db_versions()) -> SQL, oldest first
+_sql_cache = {}
+_sql_cache_lock = threading.Lock()
+
+def cached_sql(key):
+    with _sql_cache_lock:
+        return _sql_cache.get(key)
+
+def remember_sql(key, sql):
+    """
+    Caches SQL for a template. When full, entries for older database versions
+    are dropped first, then the oldest entry, as SingleFlight does.
+    """
+    with _sql_cache_lock:
+        if key not in _sql_cache and len(_sql_cache) >= SQL_CACHE_ENTRIES:
+            for stale in [k for k in _sql_cache if k[1] != key[1]]:
+                del _sql_cache[stale]
+            if len(_sql_cache) >= SQL_CACHE_ENTRIES:
+                _sql_cache.pop(next(iter(_sql_cache)))
+        _sql_cache[key] = sql
+
+# === SQL Generation ===
+def extract_sql(content):
+    fenced = re.search(r"```(?:sql)?\s*(.*?)```", content, re.DOTALL | re.IGNORECASE)
+    sql = (fenced.group(1) if fenced else content).strip().rstrip(";").strip()
+    return sql
+
+def validate_sql(sql, params):
+    """
+    Accepts one read-only SELECT that SQLite can plan; raises ValueError otherwise.
+    """
+    if not re.match(r"^\s*(select|with)\b", sql, re.IGNORECASE) or ";" in sql:
+        raise ValueError("Only a single SELECT statement is allowed.")
+    try:
+        run_limited(f"EXPLAIN {sql}", params)
+    except sqlite3.Error as e:
+        raise ValueError(f"SQLite rejected the query: {e}")
+
+def generate_sql(template, params, hints, schema_context):
+    """
+    Asks the LLM for SQL over the templated question, with one self-debug
+    round if EXPLAIN rejects it.
+    """
+    parameters = "\n".join(f":{name} = {hint}" for name, hint in hints.items()) or "none"
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT.format(schema=schema_context)},
+        {"role": "user", "content": f"Question: {template}\nParameters:\n{parameters}"},
+    ]
+    for attempt in range(DEBUG_ATTEMPTS + 1):
+        response = client.chat.completions.create(model=completion_model, messages=messages, temperature=0)
+        content = response.choices[0].message.content
+        sql = extract_sql(content)
+        try:
+            validate_sql(sql, params)
+            return sql
+        except ValueError as e:
+            if attempt == DEBUG_ATTEMPTS:
+                raise
+            print("⚠️ Generated SQL rejected, retrying:", e)
+            messages += [
+                {"role": "assistant", "content": content},
+                {"role": "user", "content": f"{e}\nReturn a corrected query."},
+            ]
+
+def schema_for(tables):
+    """
+    Schema context for the retrieved tables, from the cached per-file schemas.
+    """
+    schema = {}
+    for path in DATABASES.values():
+        for table, columns in get_dB_schema(path).items():
+            if table in tables:
+                schema[table] = columns
+    return format_dB_context(None, schema)
+
+# === Main Text-to-SQL Call ===
+def text_to_sql(question, max_rows=MAX_ROWS, time_limit=TIME_LIMIT_S):
+    """
+    Answers a question with SQL over the comfort, compliance and material databases.
+    Questions with the same shape (literals aside) reuse cached SQL and skip the LLM.
+
+    Returns:
+        dict with sql, params, columns, rows and cached (True if the LLM was skipped)
+    """
+    template, params, hints = templatize(question)
+    key = (template, db_versions())
+
+    sql = cached_sql(key)
+    cached = sql is not None
+    if not cached:
+        names, _ = sql_rag_call(template, TABLE_VECTORS)
+        sql = generate_sql(template, params, hints, schema_for(set(names.split("\n"))))
+        remember_sql(key, sql)
+
+    columns, rows = run_limited(sql, params, max_rows=max_rows, time_limit=time_limit)
+    return {"sql": sql, "params": params, "columns": columns, "rows": rows, "cached": cached}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a question with cached text-to-SQL.")
+    parser.add_argument("question")
+    parser.add_argument("--max-rows", type=int, default=MAX_ROWS)
+    parser.add_argument("--time-limit", type=float, default=TIME_LIMIT_S)
+    args = parser.parse_args()
+
+    answer = text_to_sql(args.question, max_rows=args.max_rows, time_limit=args.time_limit)
+    print(f"📝 SQL ({'cached' if answer['cached'] else 'generated'}):", answer["sql"])
+    print("🔧 Params:", answer["params"])
+    print("📋", answer["columns"])
+    for row in answer["rows"]:
+        print(row)
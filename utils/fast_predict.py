@@ -0,0 +1,165 @@
+import copy
+import threading
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+
+def without_feature_names(estimator):
+    """
+    Copy of a fitted transformer that accepts plain arrays in its fitted
+    column order, without sklearn's "X does not have valid feature names"
+    warning. Only the copies used by FeatureLayout are changed.
+    """
+    estimator = copy.deepcopy(estimator)
+    stack = [estimator]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, Pipeline):
+            stack.extend(step for _, step in current.steps if not isinstance(step, str))
+        elif "feature_names_in_" in getattr(current, "__dict__", {}):
+            del current.feature_names_in_
+    return estimator
+
+# === Feature Layout ===
+class FeatureLayout:
+    """
+    The model's input columns, positions and dtypes, resolved once per model.
+
+    Rows are referenced by their position in the dataset, and only the
+    columns the model reads are kept. Pipelines that start with a
+    ColumnTransformer are evaluated directly on a preallocated per-thread
+    NumPy row, skipping the per-request DataFrame; other models get a
+    one-row DataFrame holding just their columns.
+    """
+
+    __slots__ = ("columns", "numeric", "values", "extras", "floor_pos", "level_pos", "plan", "sparse_output", "_local")
+
+    def __init__(self, model, df, extra_columns=("laeq_db", "rt60_s")):
+        # Duplicate names keep the last column, as DataFrame.to_dict does
+        # (load_dataset already suffixes repeats, so this only guards other frames)
+        positions = {name: i for i, name in enumerate(df.columns)}
+        if hasattr(model, "feature_names_in_"):
+            self.columns = list(model.feature_names_in_)
+        else:
+            self.columns = [c for c in positions if pd.api.types.is_numeric_dtype(df.iloc[:, positions[c]])]
+
+        self.values = np.empty((len(df), len(self.columns)), dtype=object)
+        self.numeric = np.zeros(len(self.columns), dtype=bool)
+        for j, column in enumerate(self.columns):
+            if column in positions:
+                series = df.iloc[:, positions[column]]
+                self.values[:, j] = series.to_numpy()
+                self.numeric[j] = pd.api.types.is_numeric_dtype(series)
+            else:
+                self.numeric[j] = column in ("floor_height_m", "floor_level")
+
+        # Non-model columns the caller still reads per request
+        self.extras = {c: df.iloc[:, positions[c]].to_numpy() for c in extra_columns if c in positions}
+
+        self.floor_pos = self.columns.index("floor_height_m") if "floor_height_m" in self.columns else None
+        self.level_pos = self.columns.index("floor_level") if "floor_level" in self.columns else None
+        self.plan, self.sparse_output = self._build_plan(model)
+        self._local = threading.local()
+
+    def _build_plan(self, model):
+        """
+        For Pipeline(ColumnTransformer, ...): (transformer, column indices, all numeric) per block.
+        """
+        if not isinstance(model, Pipeline) or not isinstance(model.steps[0][1], ColumnTransformer):
+            return None, False
+        ct = model.steps[0][1]
+        plan = []
+        for _, transformer, cols in ct.transformers_:
+            if isinstance(transformer, str) and transformer == "drop":
+                continue
+            if isinstance(cols, slice):
+                idx = np.arange(len(self.columns))[cols]
+            else:
+                cols = np.atleast_1d(np.asarray(cols))
+                if cols.dtype == bool:
+                    idx = np.flatnonzero(cols)
+                elif cols.dtype.kind in "iu":
+                    idx = cols
+                else:
+                    idx = np.array([self.columns.index(c) for c in cols], dtype=int)
+            if len(idx) == 0:
+                continue
+            if not isinstance(transformer, str):
+                transformer = without_feature_names(transformer)
+            plan.append((transformer, idx, bool(self.numeric[idx].all())))
+        return plan, bool(getattr(ct, "sparse_output_", False))
+
+    def row_buffer(self):
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = np.empty((1, len(self.columns)), dtype=object)
+        return buffer
+
+    def assemble(self, row, floor_level=None, fallback=None):
+        """
+        Fills this thread's preallocated row from a dataset position, or from a
+        fallback feature dict (Tier 4), and applies the derived floor height.
+        """
+        buffer = self.row_buffer()
+        if row is not None:
+            buffer[0, :] = self.values[row]
+        else:
+            # Missing columns raise, as model.predict would on the fallback dict
+            buffer[0, :] = [fallback[c] for c in self.columns]
+        if floor_level is not None:
+            if self.floor_pos is not None:
+                buffer[0, self.floor_pos] = round(floor_level * 3.0, 2)
+            if self.level_pos is not None:
+                buffer[0, self.level_pos] = floor_level
+        return buffer
+
+    def predict(self, model, row, floor_level=None, fallback=None):
+        X = self.assemble(row, floor_level, fallback)
+        if self.plan is None:
+            frame = pd.DataFrame(X, columns=self.columns)
+            numeric = [c for c, is_num in zip(self.columns, self.numeric) if is_num]
+            frame[numeric] = frame[numeric].astype(float)
+            return model.predict(frame if hasattr(model, "feature_names_in_") else frame.to_numpy(float))[0]
+
+        blocks = []
+        for transformer, idx, all_numeric in self.plan:
+            block = X[:, idx].astype(float) if all_numeric else X[:, idx]
+            blocks.append(block if isinstance(transformer, str) else transformer.transform(block))
+        if self.sparse_output:
+            Xt = sparse.hstack([sparse.csr_matrix(b) for b in blocks]).tocsr()
+        else:
+            Xt = np.hstack([b.toarray() if sparse.issparse(b) else b for b in blocks])
+        for _, step in model.steps[1:-1]:
+            Xt = step.transform(Xt)
+        return model.steps[-1][1].predict(Xt)[0]
+
+    def lookup(self, row, column, fallback=None, default=None):
+        """
+        Reads one feature for a dataset position without building the row dict.
+        """
+        if row is None:
+            return (fallback or {}).get(column, default)
+        if column in self.extras:
+            return self.extras[column][row]
+        if column in self.columns:
+            return self.values[row, self.columns.index(column)]
+        return default
+
+    def verify(self, model, features, row, floor_level):
+        """
+        Checks the array path against model.predict on a one-row DataFrame of
+        the same features; falls back to the DataFrame path if they differ.
+        """
+        if self.plan is None:
+            return
+        try:
+            expected = model.predict(pd.DataFrame([features]))[0]
+            actual = self.predict(model, row, floor_level)
+            reason = None if np.isclose(actual, expected) else f"predicted {actual} instead of {expected}"
+        except Exception as e:
+            reason = str(e)
+        if reason:
+            print(f"⚠️ Fast prediction path disabled, using DataFrame rows ({reason})")
+            self.plan = None
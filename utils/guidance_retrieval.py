@@ -0,0 +1,305 @@
+import os
+import json
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from functools import lru_cache
+import numpy as np
+
+# === Paths ===
+GUIDANCE_JSON = "knowledge/compliance_guidance.json"
+GUIDANCE_VECTORS = "knowledge/compliance_guidance_vectors.json"
+THRESHOLD_VECTORS = "knowledge/compliance_thresholds_vectors.json"
+# Per-passage embeddings keyed by model; build with utils/vectorise_compliance_guidance.py
+PASSAGE_VECTORS = "knowledge/compliance_guidance_passage_vectors.json"
+
+# Embedding model behind the stored section and threshold vectors (cloudflare mode)
+STORED_VECTORS_MODEL = "@cf/baai/bge-base-en-v1.5"
+
+STOPWORDS = {
+    "a", "an", "and", "the", "or", "of", "to", "in", "on", "for", "with", "by",
+    "is", "are", "be", "as", "at", "it", "like", "use", "s",
+}
+
+# === Tokenizer ===
+def stem(token):
+    """
+    Light suffix stripping so inflections meet: glazed/glazing -> glaz,
+    absorption/absorptive -> absorpt, windows -> window, finishes -> finish.
+    """
+    for suffix in ("ing", "ion", "ive", "ed", "es", "s"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            if suffix == "es" and not token[:-2].endswith(("s", "x", "z", "ch", "sh")):
+                continue
+            if suffix == "s" and token.endswith("ss"):
+                continue
+            token = token[:-len(suffix)]
+            break
+    return token[:-1] if token.endswith("e") and len(token) > 4 else token
+
+def tokenize(text):
+    return [stem(tok) for tok in re.findall(r"[a-z0-9]+", text.lower()) if tok not in STOPWORDS]
+
+# === Rule Conditions ===
+def condition_holds(condition, context):
+    """
+    Evaluates a contextual rule condition against the input, e.g.
+    "wall_material contains 'concrete'" or "Floor_Level > 1".
+    Unknown fields, missing values and unrecognized conditions do not hold.
+    """
+    contains = re.fullmatch(r"\s*(\w+)\s+contains\s+'([^']*)'\s*", condition)
+    if contains:
+        value = context.get(contains.group(1))
+        return value is not None and contains.group(2).lower() in str(value).lower()
+
+    comparison = re.fullmatch(r"\s*(\w+)\s*(==|!=|>=|<=|>|<)\s*(-?\d+(?:\.\d+)?)\s*", condition)
+    if comparison:
+        field, op, bound = comparison.groups()
+        try:
+            value = float(context.get(field))
+        except (TypeError, ValueError):
+            return False
+        bound = float(bound)
+        return {
+            "==": value == bound, "!=": value != bound,
+            ">=": value >= bound, "<=": value <= bound,
+            ">": value > bound, "<": value < bound,
+        }[op]
+    return False
+
+# === Lexical Index ===
+class BM25Index:
+    """
+    Okapi BM25 over a fixed passage list, with a precomputed inverted index
+    (term -> [(passage id, term frequency)]) so scoring only touches passages
+    that share a term with the query.
+    """
+
+    def __init__(self, texts, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.n_docs = len(texts)
+        self.doc_len = np.array([len(tokenize(text)) for text in texts], dtype=float)
+        self.avg_len = self.doc_len.mean() if self.n_docs else 0.0
+        self.postings = defaultdict(list)
+        for doc_id, text in enumerate(texts):
+            for term, tf in Counter(tokenize(text)).items():
+                self.postings[term].append((doc_id, tf))
+        self.idf = {
+            term: math.log(1 + (self.n_docs - len(posts) + 0.5) / (len(posts) + 0.5))
+            for term, posts in self.postings.items()
+        }
+
+    def scores(self, query):
+        scores = np.zeros(self.n_docs)
+        for term in set(tokenize(query)):
+            for doc_id, tf in self.postings.get(term, []):
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / self.avg_len)
+                scores[doc_id] += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+# === Vector Index ===
+class VectorIndex:
+    """
+    Row-normalized embedding matrix; one matrix-vector product per query.
+    """
+
+    def __init__(self, vectors):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.matrix = matrix / np.where(norms == 0, 1, norms)
+
+    def scores(self, query_vector):
+        query = np.asarray(query_vector, dtype=np.float32)
+        return self.matrix @ (query / (np.linalg.norm(query) or 1))
+
+# === Rank Fusion ===
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuses several ranked lists of passage ids: score(d) = sum 1 / (k + rank).
+    """
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] += 1.0 / (k + rank)
+    return sorted(fused, key=fused.get, reverse=True)
+
+# === Passage Index ===
+class GuidanceIndex:
+    """
+    Guidance (and optionally threshold) passages with a BM25 and an embedding index.
+
+    Each recommendation and contextual rule in compliance_guidance.json becomes
+    its own passage, and contextual rules only apply when their condition holds
+    for the input. Every vector belongs to one embedding model: the stored
+    section and threshold vectors are used as-is for STORED_VECTORS_MODEL,
+    and anything else (per-passage vectors, or all of them under another
+    model) comes from the PASSAGE_VECTORS cache or one batched embedding call.
+    """
+
+    def __init__(self, guidance_path=GUIDANCE_JSON, section_vectors=GUIDANCE_VECTORS, threshold_vectors=THRESHOLD_VECTORS,
+                 passage_vectors=PASSAGE_VECTORS, include_thresholds=True):
+        with open(guidance_path, encoding="utf-8") as f:
+            guidance = json.load(f)
+        with open(section_vectors, encoding="utf-8") as f:
+            sections = json.load(f)
+        thresholds = []
+        if include_thresholds:
+            with open(threshold_vectors, encoding="utf-8") as f:
+                thresholds = json.load(f)
+
+        self.passages = []
+        for key, section in guidance.items():
+            issue = key.split("_")[0]
+            for text in section.get("general_recommendations", []):
+                self.passages.append({"issue": issue, "kind": "recommendation", "section": key, "content": text})
+            for rule in section.get("contextual_rules", []):
+                self.passages.append({
+                    "issue": issue,
+                    "kind": "contextual",
+                    "section": key,
+                    "content": rule["suggestion"],
+                    "condition": rule["condition"],
+                })
+        for item in thresholds:
+            self.passages.append({"issue": None, "kind": "threshold", "name": item["name"], "content": item["content"]})
+
+        # Section texts are embedded too, to rank sections when no issue is given
+        self.sections = {item["key"]: item["content"] for item in sections}
+        self.stored_vectors = {item["content"]: item["vector"] for item in sections + thresholds}
+
+        # Contextual rules are indexed with the material keyword from their condition
+        self.bm25 = BM25Index([
+            " ".join([p["content"], p.get("name", "")] + re.findall(r"'([^']+)'", p.get("condition", "")))
+            for p in self.passages
+        ])
+        self.passage_vectors = passage_vectors
+        self.vectors = None
+        self.section_vectors = None
+        self.model = None
+        self._lock = threading.Lock()
+
+    def texts_to_embed(self):
+        return list(dict.fromkeys([p["content"] for p in self.passages] + list(self.sections.values())))
+
+    def read_cache(self, model):
+        if not os.path.exists(self.passage_vectors):
+            return {}
+        with open(self.passage_vectors, encoding="utf-8") as f:
+            stored = json.load(f)
+        return stored.get("models", {}).get(model, {})
+
+    def write_cache(self, model, vectors):
+        """
+        Merges vectors for one model into PASSAGE_VECTORS, atomically, so
+        parallel workers never leave a partial file.
+        """
+        stored = {"models": {}}
+        if os.path.exists(self.passage_vectors):
+            with open(self.passage_vectors, encoding="utf-8") as f:
+                stored = json.load(f)
+        stored.setdefault("models", {}).setdefault(model, {}).update(vectors)
+        tmp = f"{self.passage_vectors}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(stored, f)
+        os.replace(tmp, self.passage_vectors)
+
+    def embed_passages(self, embed_batch, model):
+        """
+        Builds the vector index for `model`. Texts without a vector for that
+        model are embedded in one batched call, outside the lock, and cached.
+        """
+        if self.model == model:
+            return self.vectors
+        known = dict(self.stored_vectors) if model == STORED_VECTORS_MODEL else {}
+        known.update(self.read_cache(model))
+        missing = [text for text in self.texts_to_embed() if text not in known]
+        if missing:
+            fresh = dict(zip(missing, embed_batch(missing)))
+            self.write_cache(model, fresh)
+            known.update(fresh)
+
+        vectors = VectorIndex([known[p["content"]] for p in self.passages])
+        section_vectors = dict(zip(self.sections, VectorIndex([known[t] for t in self.sections.values()]).matrix))
+        with self._lock:
+            self.vectors, self.section_vectors, self.model = vectors, section_vectors, model
+        return vectors
+
+    def search(self, query, issue=None, n_results=3, query_vector=None, include_thresholds=True, context=None):
+        """
+        Ranks passages for a query. Passages for the other metric, and contextual
+        rules whose condition fails for `context`, are excluded. If fewer than
+        n_results passages match, the issue's general recommendations fill the
+        rest in file order. Without query_vector this is purely lexical and
+        makes no API calls; with it, embed_passages must have been called.
+        """
+        allowed = np.array([
+            (issue is None or p["issue"] in (None, issue))
+            and (include_thresholds or p["kind"] != "threshold")
+            and (context is None or p["kind"] != "contextual" or condition_holds(p["condition"], context))
+            for p in self.passages
+        ])
+
+        lexical = self.bm25.scores(query)
+        rankings = [[i for i in np.argsort(-lexical, kind="stable") if allowed[i] and lexical[i] > 0]]
+        if query_vector is not None:
+            semantic = self.vectors.scores(query_vector)
+            rankings.append([i for i in np.argsort(-semantic, kind="stable") if allowed[i]])
+            if issue is None:
+                # Section similarity only separates issues, so it is left out once one is chosen
+                query = np.asarray(query_vector, dtype=np.float32)
+                section_scores = {key: float(v @ query) for key, v in self.section_vectors.items()}
+                rankings.append(sorted(
+                    (i for i in np.flatnonzero(allowed) if "section" in self.passages[i]),
+                    key=lambda i: -section_scores.get(self.passages[i]["section"], 0.0),
+                ))
+
+        top = reciprocal_rank_fusion(rankings)[:n_results]
+        if issue is not None:
+            for i, p in enumerate(self.passages):
+                if len(top) >= n_results:
+                    break
+                if p["issue"] == issue and p["kind"] == "recommendation" and i not in top:
+                    top.append(i)
+        return [self.passages[i] for i in top]
+
+@lru_cache(maxsize=None)
+def load_guidance_index(include_thresholds=True):
+    return GuidanceIndex(include_thresholds=include_thresholds)
+
+# === Query Builder ===
+def build_guidance_query(issue, activity=None, wall_material=None, window_material=None, floor_level=None):
+    """
+    Turns a non-compliance into a retrieval query.
+    """
+    parts = [issue]
+    parts.append("noise intrusion" if issue == "LAeq" else "echo reverberation absorption")
+    if activity:
+        parts.append(activity)
+    if wall_material:
+        parts.append(wall_material)
+    if window_material:
+        parts.append(window_material)
+    if floor_level is not None:
+        parts.append("ground street-level" if floor_level <= 1 else "upper floors")
+    return " ".join(parts)
+
+# === Main Retrieval Call ===
+def retrieve_guidance(issue, activity=None, wall_material=None, window_material=None, floor_level=None, n_results=3, use_embeddings=False, include_thresholds=True):
+    """
+    Returns the top guidance passages for a non-compliant metric ("LAeq" or "RT60").
+    The lexical path is always used; set use_embeddings=True (or
+    guidance_retrieval = "hybrid" in server/config.py, for recommend_recompute)
+    to also embed the query and fuse both rankings with reciprocal rank fusion.
+    """
+    index = load_guidance_index(include_thresholds)
+    query = build_guidance_query(issue, activity, wall_material, window_material, floor_level)
+    context = {"wall_material": wall_material, "window_material": window_material, "Floor_Level": floor_level}
+    query_vector = None
+    if use_embeddings:
+        from utils.rag_utils import get_embedding, get_embeddings, embedding_model
+        index.embed_passages(get_embeddings, embedding_model)
+        query_vector = get_embedding(query)
+    return index.search(query, issue=issue, n_results=n_results, query_vector=query_vector,
+                        include_thresholds=include_thresholds, context=context)
@@ -1,5 +1,8 @@
 import pandas as pd
 import re
+from functools import lru_cache
+
+DATA_PATH = "sql/Ecoform_Dataset_v1.csv"
 
 # === Column Cleaner ===
 def clean_col(col):
@@ -8,26 +11,56 @@ def clean_col(col):
     col = re.sub(r'\s+', '_', col)
     return col
 
-# === Tiered Feature Inference Function ===
-def infer_features(apartment_type, zone, element=None, element_material=None, floor_level=None):
+def dedupe_cols(cols):
     """
-    Infers the best-matching acoustic dataset entry given partial or full user input.
+    Suffixes repeated names (_2, _3, ...) the way scripts/train_model_v1.py
+    does, so rows carry every column the model was trained on.
+    """
+    seen = {}
+    deduped = []
+    for col in cols:
+        if col not in seen:
+            seen[col] = 1
+            deduped.append(col)
+        else:
+            seen[col] += 1
+            deduped.append(f"{col}_{seen[col]}")
+    return deduped
 
-    Args:
-        apartment_type (str): e.g. "1Bed", "2Bed"
-        zone (str): e.g. "HD-Urban-V1"
-        element (str): Room use or function (e.g. "Living", "Sleeping") – optional
-        element_material (str): Material keyword (e.g. "concrete", "single glazing")
-        floor_level (int): Optional floor level (used to compute floor_height_m)
+# === Cached Dataset Loader ===
+@lru_cache(maxsize=None)
+def load_dataset(path=DATA_PATH):
+    """
+    Reads, column-cleans and dedupes the acoustic dataset once per process.
+    Callers must treat the returned DataFrame as read-only.
+    """
+    df = pd.read_csv(path)
+    df.columns = dedupe_cols([clean_col(col) for col in df.columns])
+    return df
+
+# === Column Keys ===
+APT_COL = "apartment_type_string"
+ZONE_COL = "zone_string"
+MATERIAL_COL = "element_materials_string"
+
+@lru_cache(maxsize=None)
+def lowered_keys():
+    """
+    Lowercased match columns, computed once per process.
+    """
+    df = load_dataset()
+    return df[APT_COL].str.lower(), df[ZONE_COL].str.lower(), df[MATERIAL_COL].str.lower()
+
+# === Tiered Row Matching ===
+def match_row(apartment_type, zone, element=None, element_material=None):
+    """
+    Finds the best-matching dataset row without materializing it.
 
     Returns:
-        features (dict): Matched or inferred feature row
+        row (int or None): Positional index into load_dataset(), None for Tier 4
         tier (str): Match strength description (Tier 1 to Tier 4)
     """
-
-    # === Load and clean dataset ===
-    df = pd.read_csv("sql/Ecoform_Dataset_v1.csv")
-    df.columns = [clean_col(col) for col in df.columns]
+    apartments, zones, materials = lowered_keys()
 
     # === Normalize inputs ===
     apartment_type = apartment_type.lower()
@@ -35,55 +68,67 @@ def infer_features(apartment_type, zone, element=None, element_material=None, fl
     material_kw = element_material.lower() if element_material else ""
     element_kw = element.lower() if element else ""
 
-    # === Define keys ===
-    apt_col = "apartment_type_string"
-    zone_col = "zone_string"
-    material_col = "element_materials_string"
+    base = (apartments == apartment_type) & (zones == zone)
 
     # === Tier 1: Match apartment + zone + material keyword + element keyword ===
-    match = df[
-        (df[apt_col].str.lower() == apartment_type) &
-        (df[zone_col].str.lower() == zone) &
-        (df[material_col].str.lower().str.contains(material_kw)) &
-        (df[material_col].str.lower().str.contains(element_kw))
-    ]
-    if not match.empty:
-        features = match.iloc[0].to_dict()
-        tier = "Tier 1"
+    match = base & materials.str.contains(material_kw) & materials.str.contains(element_kw)
+    if match.any():
         print("✅ Tier 1: Match on apartment, zone, material, and element.")
+        return int(match.to_numpy().argmax()), "Tier 1"
+
+    # === Tier 2: Match apartment + zone + material keyword ===
+    match = base & materials.str.contains(material_kw)
+    if match.any():
+        print("⚠️ Tier 2: Match on apartment, zone, and material.")
+        return int(match.to_numpy().argmax()), "Tier 2"
+
+    # === Tier 3: Match apartment + zone only ===
+    if base.any():
+        print("⚠️ Tier 3: Match on apartment and zone.")
+        return int(base.to_numpy().argmax()), "Tier 3"
 
+    # === Tier 4: Use dataset mean fallback ===
+    print("⚠️ Tier 4: Using dataset average values.")
+    return None, "Tier 4"
+
+@lru_cache(maxsize=None)
+def dataset_means():
+    return load_dataset().mean(numeric_only=True).to_dict()
+
+def fallback_features(apartment_type, zone, element=None, element_material=None):
+    """
+    Tier 4 feature row: dataset means plus the normalized input strings.
+    """
+    material_kw = element_material.lower() if element_material else ""
+    element_kw = element.lower() if element else ""
+    return {
+        APT_COL: apartment_type.lower(),
+        ZONE_COL: zone.lower(),
+        MATERIAL_COL: f"{element_kw}: {material_kw}",
+        **dataset_means()
+    }
+
+# === Tiered Feature Inference Function ===
+def infer_features(apartment_type, zone, element=None, element_material=None, floor_level=None):
+    """
+    Infers the best-matching acoustic dataset entry given partial or full user input.
+
+    Args:
+        apartment_type (str): e.g. "1Bed", "2Bed"
+        zone (str): e.g. "HD-Urban-V1"
+        element (str): Room use or function (e.g. "Living", "Sleeping") – optional
+        element_material (str): Material keyword (e.g. "concrete", "single glazing")
+        floor_level (int): Optional floor level (used to compute floor_height_m)
+
+    Returns:
+        features (dict): Matched or inferred feature row
+        tier (str): Match strength description (Tier 1 to Tier 4)
+    """
+    row, tier = match_row(apartment_type, zone, element, element_material)
+    if row is not None:
+        features = load_dataset().iloc[row].to_dict()
     else:
-        # === Tier 2: Match apartment + zone + material keyword ===
-        match = df[
-            (df[apt_col].str.lower() == apartment_type) &
-            (df[zone_col].str.lower() == zone) &
-            (df[material_col].str.lower().str.contains(material_kw))
-        ]
-        if not match.empty:
-            features = match.iloc[0].to_dict()
-            tier = "Tier 2"
-            print("⚠️ Tier 2: Match on apartment, zone, and material.")
-        else:
-            # === Tier 3: Match apartment + zone only ===
-            match = df[
-                (df[apt_col].str.lower() == apartment_type) &
-                (df[zone_col].str.lower() == zone)
-            ]
-            if not match.empty:
-                features = match.iloc[0].to_dict()
-                tier = "Tier 3"
-                print("⚠️ Tier 3: Match on apartment and zone.")
-            else:
-                # === Tier 4: Use dataset mean fallback ===
-                print("⚠️ Tier 4: Using dataset average values.")
-                means = df.mean(numeric_only=True).to_dict()
-                features = {
-                    apt_col: apartment_type,
-                    zone_col: zone,
-                    material_col: f"{element_kw}: {material_kw}",
-                    **means
-                }
-                tier = "Tier 4"
+        features = fallback_features(apartment_type, zone, element, element_material)
 
     # === Add derived floor height ===
     if floor_level is not None:
@@ -0,0 +1,303 @@
+# utils/profiling.py
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import pstats
+import cProfile
+import argparse
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# === Settings ===
+# PROFILE_RATE: fraction of requests to profile (0 = off, 1 = every request)
+# PROFILE_MODE: "cprofile" (deterministic, pstats files) or "sample" (collapsed stacks)
+settings = {
+    "rate": float(os.environ.get("PROFILE_RATE", 0) or 0),
+    "mode": os.environ.get("PROFILE_MODE", "cprofile"),
+    "dir": os.environ.get("PROFILE_DIR", "profiles"),
+    "interval": float(os.environ.get("PROFILE_INTERVAL_MS", 5)) / 1000,
+}
+
+# Servers opt a single request in with this header
+PROFILE_HEADER = "X-Profile"
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def configure(rate=None, mode=None, directory=None, interval_ms=None):
+    """
+    Overrides the environment settings, e.g. from a CLI flag.
+    """
+    if rate is not None:
+        settings["rate"] = rate
+    if mode is not None:
+        settings["mode"] = mode
+    if directory is not None:
+        settings["dir"] = directory
+    if interval_ms is not None:
+        settings["interval"] = interval_ms / 1000
+
+def wants_profile(headers):
+    return str(headers.get(PROFILE_HEADER, "")).lower() in ("1", "true", "yes")
+
+# === Frame Labels ===
+def frame_label(filename, name):
+    """
+    'package/module.py:function', with site-packages and project prefixes stripped.
+    Builtins (no file) keep just their name, e.g. "<method 'execute' of 'sqlite3.Connection' objects>".
+    """
+    if filename == "~" or filename.startswith("<"):
+        return re.sub(r" at 0x[0-9a-f]+", "", name)
+    if "site-packages" + os.sep in filename:
+        filename = filename.split("site-packages" + os.sep)[-1]
+    elif filename.startswith(PROJECT_ROOT):
+        filename = os.path.relpath(filename, PROJECT_ROOT)
+    return f"{filename.replace(os.sep, '/')}:{name}"
+
+# === Sampling Profiler ===
+class SamplingProfiler:
+    """
+    Samples one thread's stack every `interval` seconds from a background
+    thread and counts collapsed stacks ("root;...;leaf"). Cheaper than
+    cProfile for long requests, at the cost of statistical precision.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self._target = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def enable(self):
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def disable(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame.f_code.co_filename, frame.f_code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+# === Per-request Profiles ===
+_active = threading.local()
+
+class RequestProfile:
+    """
+    One profiled request. stop() writes the profile next to a .json sidecar
+    holding its tags (inputs, tier), mode and duration.
+    """
+
+    def __init__(self, mode, directory, interval):
+        self.mode = mode
+        self.directory = directory
+        self.interval = interval
+        self.profiler = SamplingProfiler(interval) if mode == "sample" else cProfile.Profile()
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.profiler.enable()
+        _active.profile = self
+        return self
+
+    def stop(self, tags=None):
+        self.profiler.disable()
+        seconds = time.perf_counter() - self.started
+        _active.profile = None
+
+        tags = tags or {}
+        os.makedirs(self.directory, exist_ok=True)
+        slug = "_".join(re.sub(r"[^\w.-]+", "-", str(v)).strip("-") for v in tags.values() if v not in (None, ""))
+        base = os.path.join(self.directory, f"{time.time_ns()}-{os.getpid()}" + (f"-{slug[:80]}" if slug else ""))
+        if self.mode == "sample":
+            path = base + ".collapsed"
+            self.profiler.dump(path)
+        else:
+            path = base + ".pstats"
+            self.profiler.dump_stats(path)
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump({"tags": tags, "mode": self.mode, "interval_s": self.interval, "seconds": seconds, "profile": os.path.basename(path)}, f, default=str)
+        return path
+
+def start_profile(force=False):
+    """
+    Starts profiling this request if forced or sampled at PROFILE_RATE.
+    Returns None (after one comparison) when profiling is off, and when this
+    thread is already inside a profiled request.
+    """
+    rate = settings["rate"]
+    if not force and (rate <= 0 or (rate < 1 and random.random() >= rate)):
+        return None
+    if getattr(_active, "profile", None) is not None:
+        return None
+    try:
+        return RequestProfile(settings["mode"], settings["dir"], settings["interval"]).start()
+    except ValueError:
+        # Another profiler is already attached (e.g. running under python -m cProfile)
+        return None
+
+def request_tags(user_input, tier=None):
+    return {
+        "apartment": user_input.get("Apartment_Type"),
+        "zone": user_input.get("Zone"),
+        "floor": user_input.get("Floor_Level"),
+        "activity": user_input.get("activity"),
+        "wall": user_input.get("wall_material"),
+        "window": user_input.get("window_material"),
+        "tier": tier,
+    }
+
+@contextmanager
+def profile_request(user_input, force=False):
+    """
+    Profiles the wrapped block when sampled. Set tags["tier"] inside the block
+    once the tier is known.
+    """
+    profile = start_profile(force)
+    tags = {}
+    try:
+        yield tags
+    finally:
+        if profile is not None:
+            profile.stop({**request_tags(user_input), **tags})
+
+# === Aggregation ===
+# Where request time goes: matched against frame labels, inclusive of callees
+CATEGORIES = {
+    "csv parsing": ("pandas/io/parsers", "pandas/io/common.py"),
+    "model load": ("joblib/numpy_pickle",),
+    "sqlite": ("sqlite3", "pandas/io/sql.py"),
+    "model predict": ("sklearn/",),
+    "llm": ("openai/", "httpx/", "server/llm_client.py"),
+}
+
+def categories_of(label):
+    return {name for name, patterns in CATEGORIES.items() if any(p in label for p in patterns)}
+
+def read_pstats(path):
+    """
+    Per-function self and inclusive seconds, and inclusive seconds per category:
+    time on call edges into the category from code that is not itself running
+    under the category, so nested and re-entrant calls count once.
+    """
+    stats = pstats.Stats(path).stats
+    labels = {func: frame_label(func[0], func[2]) for func in stats}
+    functions = defaultdict(lambda: [0.0, 0.0])
+    for func, (_, _, tt, ct, _) in stats.items():
+        functions[labels[func]][0] += tt
+        functions[labels[func]][1] += ct
+
+    callees = defaultdict(list)
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller in callers:
+            callees[caller].append(func)
+
+    categories = Counter()
+    for category in CATEGORIES:
+        members = [f for f in stats if category in categories_of(labels[f])]
+        # Everything reachable from a category function runs under it
+        inside, stack = set(), list(members)
+        while stack:
+            for callee in callees[stack.pop()]:
+                if callee not in inside:
+                    inside.add(callee)
+                    stack.append(callee)
+        for func in members:
+            callers = stats[func][4]
+            if not callers:
+                categories[category] += stats[func][3]
+            categories[category] += sum(edge[3] for caller, edge in callers.items() if caller not in inside and caller not in members)
+    return functions, categories
+
+def read_collapsed(path, interval):
+    functions = defaultdict(lambda: [0.0, 0.0])
+    categories = Counter()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            seconds = int(count) * interval
+            frames = stack.split(";")
+            functions[frames[-1]][0] += seconds
+            for label in set(frames):
+                functions[label][1] += seconds
+            for category in set().union(*map(categories_of, frames)):
+                categories[category] += seconds
+    return functions, categories
+
+def aggregate(directory, by=None):
+    """
+    Sums every profile in directory.
+
+    Returns:
+        functions (dict): label -> [self seconds, inclusive seconds]
+        groups (dict): tag value (or "all") -> {"requests", "seconds", "categories"}
+    """
+    functions = defaultdict(lambda: [0.0, 0.0])
+    groups = defaultdict(lambda: {"requests": 0, "seconds": 0.0, "categories": Counter()})
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            meta = json.load(f)
+        path = os.path.join(directory, meta["profile"])
+        if not os.path.exists(path):
+            continue
+        if meta["mode"] == "sample":
+            per_function, per_category = read_collapsed(path, meta["interval_s"])
+        else:
+            per_function, per_category = read_pstats(path)
+        for label, (self_s, inclusive_s) in per_function.items():
+            functions[label][0] += self_s
+            functions[label][1] += inclusive_s
+        group = groups[str(meta["tags"].get(by)) if by else "all"]
+        group["requests"] += 1
+        group["seconds"] += meta["seconds"]
+        group["categories"].update(per_category)
+    return functions, groups
+
+def print_report(directory, top=20, sort="self", by=None):
+    functions, groups = aggregate(directory, by)
+    if not groups:
+        print(f"❌ No profiles found in {directory}")
+        return
+
+    print(f"📊 Where the time goes{f' by {by}' if by else ''}:")
+    for key, group in sorted(groups.items()):
+        total = group["seconds"]
+        shares = " | ".join(
+            f"{name} {group['categories'][name] / total:.0%}" for name in CATEGORIES if group["categories"][name]
+        )
+        print(f"  {key}: {group['requests']} requests, {total / group['requests'] * 1000:.1f} ms avg | {shares or 'no category time'}")
+
+    column = 0 if sort == "self" else 1
+    print(f"\n🔥 Top {top} functions by {sort} time:")
+    print(f"  {'self s':>9} {'incl s':>9}  function")
+    for label, (self_s, inclusive_s) in sorted(functions.items(), key=lambda item: -item[1][column])[:top]:
+        print(f"  {self_s:>9.3f} {inclusive_s:>9.3f}  {label}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate request profiles into a hot-function report.")
+    parser.add_argument("directory", nargs="?", default=settings["dir"])
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--sort", choices=["self", "inclusive"], default="self")
+    parser.add_argument("--by", help="Group the category breakdown by a tag, e.g. tier or zone")
+    args = parser.parse_args()
+    print_report(args.directory, top=args.top, sort=args.sort, by=args.by)
@@ -0,0 +1,138 @@
+import re
+
+# === Token Budget ===
+# Tokens for the whole build_answer prompt (system + user), by estimate_tokens
+DEFAULT_TOKEN_BUDGET = 300
+
+# === Stable System Prompt ===
+# Kept byte-identical across calls and placed first, so provider-side prompt
+# caching can reuse the prefix.
+SYSTEM_PROMPT = (
+    "You summarize acoustic comfort evaluations for architects and sustainability consultants. "
+    "Input is 'key: value' lines; 'fix.<metric>' lists ranked remedies for a failing metric. "
+    "State compliance clearly, do not repeat sentences, use bullets if useful, "
+    "summarize any material upgrades usefully, and give no suggestions when compliant."
+)
+
+# === Tokenizer Estimate ===
+def estimate_tokens(text):
+    """
+    Local estimate of BPE token count: one token per punctuation mark and per
+    ~4 characters of each word. Close enough to budget prompts without a tokenizer.
+    """
+    return sum(
+        (len(piece) + 3) // 4 if piece[0].isalnum() else 1
+        for piece in re.findall(r"\w+|[^\w\s]", text)
+    )
+
+def count_message_tokens(messages):
+    # ~4 tokens of per-message overhead in chat formats
+    return sum(estimate_tokens(m["content"]) + 4 for m in messages)
+
+# === Compact Serialization ===
+def is_compliant(result):
+    status = str(result.get("compliance", {}).get("status", "")).lower()
+    return "compliant" in status and "not" not in status
+
+def compact_lines(result, recommendations):
+    """
+    Serializes an evaluation result as deterministic 'key: value' lines, using
+    the (possibly trimmed) recommendations given. Per-metric measurements and
+    remedies are only kept for non-compliant results; each metric's verdict
+    comes from the '<metric>_ok' flag recommend_recompute stores, and is
+    omitted when there is none (e.g. database matches).
+    """
+    compliance = result.get("compliance", {})
+    score = result.get("comfort_score")
+    compliant = is_compliant(result)
+
+    lines = [
+        f"score: {score if score is not None else 'N/A'} ({result.get('source', 'N/A')})",
+        f"compliance: {'compliant' if compliant else 'not compliant'} ({compliance.get('reason', 'N/A')})",
+    ]
+    if not compliant:
+        for metric in ("LAeq", "RT60"):
+            if metric in compliance:
+                passed = compliance.get(f"{metric}_ok")
+                verdict = "" if passed is None else (" ok" if passed else " fail")
+                lines.append(f"{metric}: {compliance[metric]}{verdict}")
+        for metric in sorted(recommendations):
+            lines.append(f"fix.{metric}:")
+            lines.extend(f"- {item}" for item in recommendations[metric])
+
+    best_materials = result.get("best_materials")
+    if best_materials:
+        upgrades = "; ".join(f"{k}={best_materials[k]}" for k in sorted(best_materials))
+        best_score = result.get("best_score")
+        lines.append(f"upgrades: {upgrades} -> {round(best_score, 3) if best_score else 'N/A'}")
+    return lines
+
+def trim_recommendations(recommendations):
+    """
+    Drops the lowest-ranked remedy from the metric with the most remaining.
+    Returns False when nothing is left to drop.
+    """
+    longest = max(sorted(recommendations), key=lambda m: len(recommendations[m]), default=None)
+    if longest is None or not recommendations[longest]:
+        return False
+    recommendations[longest] = recommendations[longest][:-1]
+    if not recommendations[longest]:
+        del recommendations[longest]
+    return True
+
+# === Prompt Builders ===
+def compact_answer_messages(user_question, result, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Builds the build_answer messages in the compact format, trimming ranked
+    recommendations until the prompt fits token_budget.
+    """
+    recommendations = {m: list(items) for m, items in (result.get("recommendations") or {}).items() if items}
+    while True:
+        user = "\n".join([f"question: {' '.join(user_question.split())}"] + compact_lines(result, recommendations))
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user},
+        ]
+        if count_message_tokens(messages) <= token_budget or not trim_recommendations(recommendations):
+            return messages
+
+def verbose_answer_messages(user_question, result):
+    """
+    The original build_answer prompt: raw dict reprs and the long system prompt.
+    Kept for comparison in benchmark.py.
+    """
+    compliance = result.get("compliance", {})
+    recommendations = result.get("recommendations", {})
+    best_materials = result.get("best_materials", {})
+    best_score = result.get("best_score", None)
+
+    summary_prompt = f"""
+User Question:
+{user_question}
+
+📊 Evaluation Summary:
+- Comfort Score: {result.get("comfort_score")}
+- Source: {result.get("source", "N/A")}
+- Compliance: {compliance.get("status")} — {compliance.get("reason")}
+
+🛠 Recommendations:
+{recommendations if recommendations else "None needed"}
+
+💡 Material Upgrade Suggestions:
+{best_materials if best_materials else "No upgrades suggested"}
+Improved Score: {round(best_score, 3) if best_score else "N/A"}
+"""
+    system_prompt = """
+You summarize acoustic comfort evaluations for architects and sustainability consultants.
+
+Instructions:
+- Do not repeat sentences.
+- Clearly state compliance.
+- If material upgrades are provided, summarize them usefully.
+- Use bullets for clarity if needed.
+- If compliant, avoid unnecessary suggestions.
+"""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": summary_prompt},
+    ]
@@ -3,28 +3,47 @@ import json
 import os
 import sys
 import re
+from functools import lru_cache
 
 # Add the project root to path for module imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from server.config import *
 
-# Embedding wrapper
+# Embedding wrapper (memoized: identical text is embedded once per process)
+@lru_cache(maxsize=1024)
 def get_embedding(text, model=embedding_model):
     text = text.replace("\n", " ")
-    if mode == "openai":
+    if model == openai_embedding_model:
         response = client.embeddings.create(input=[text], dimensions=768, model=model)
     else:
         response = client.embeddings.create(input=[text], model=model)
     return response.data[0].embedding
 
+# Batched embeddings: one request for many texts, in input order
+def get_embeddings(texts, model=embedding_model):
+    texts = [text.replace("\n", " ") for text in texts]
+    if model == openai_embedding_model:
+        response = client.embeddings.create(input=texts, dimensions=768, model=model)
+    else:
+        response = client.embeddings.create(input=texts, model=model)
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
 # Compute cosine similarity
 def similarity(v1, v2):
     return np.dot(v1, v2)
 
-# Load vectorized JSON
+# Load vectorized JSON, re-read only when the file's mtime changes
+_embedding_cache = {}
+
 def load_embeddings(filepath):
+    mtime = os.path.getmtime(filepath)
+    cached = _embedding_cache.get(filepath)
+    if cached and cached[0] == mtime:
+        return cached[1]
     with open(filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
+        index_lib = json.load(f)
+    _embedding_cache[filepath] = (mtime, index_lib)
+    return index_lib
 
 # Get top-N similar entries
 def get_vectors(query_vector, index_lib, n_results):
@@ -51,10 +70,13 @@ def rag_answer(question, prompt, model=completion_model):
     )
     return completion.choices[0].message.content
 
-# Main RAG call
+# Main RAG call (results cached per question, file version and n_results)
 def sql_rag_call(question, embedding_file, n_results=3):
     print("🔍 Initiating RAG...")
+    return _sql_rag_call(question, embedding_file, os.path.getmtime(embedding_file), n_results)
 
+@lru_cache(maxsize=1024)
+def _sql_rag_call(question, embedding_file, mtime, n_results):
     # Step 1: Embed the user's question
     question_vector = get_embedding(question)
 
@@ -0,0 +1,157 @@
+import asyncio
+import copy
+import functools
+import threading
+import time
+from concurrent.futures import Future, CancelledError
+
+# === Input Canonicalization ===
+NAME_FIELDS = ["Apartment_Type", "Zone", "Element", "wall_material", "window_material", "activity"]
+
+def canonical_input(user_input):
+    """
+    Builds a hashable key under which equivalent user inputs collide:
+    names are lowercased (whitespace kept) and Floor_Level is mapped to
+    floor_height_m, exactly as query_or_recommend and infer_features compare them.
+    """
+    key = {}
+    for field, value in user_input.items():
+        if field in NAME_FIELDS and isinstance(value, str):
+            key[field] = value.lower()
+        elif field == "Floor_Level" and value is not None:
+            key["floor_height_m"] = round(float(value) * 3.0, 2)
+        else:
+            key[field] = value
+    return tuple(sorted((k, repr(v)) for k, v in key.items()))
+
+# === Single-flight Group ===
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time. Concurrent callers with the
+    same key, from threads or asyncio tasks, wait on the one in-flight result,
+    which is then kept in a short-TTL cache.
+
+    Each caller receives its own deep copy of the result. Exceptions raised by
+    the computation are shared too; a caller that is cancelled or interrupted
+    only fails itself, and waiting callers retry if the computation was lost.
+    """
+
+    def __init__(self, ttl=5.0, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._cache = {}
+        self._tasks = set()
+        self.stats = {"calls": 0, "executions": 0, "coalesced": 0, "cache_hits": 0}
+
+    def _claim(self, key):
+        """
+        Returns (future, is_leader). The leader must run the computation.
+        """
+        with self._lock:
+            self.stats["calls"] += 1
+            cached = self._cache.get(key)
+            if cached and cached[0] > time.monotonic():
+                self.stats["cache_hits"] += 1
+                future = Future()
+                future.set_result(cached[1])
+                return future, False
+            if key in self._inflight:
+                self.stats["coalesced"] += 1
+                return self._inflight[key], False
+            future = Future()
+            self._inflight[key] = future
+            self.stats["executions"] += 1
+            return future, True
+
+    def _settle(self, key, future, result=None, error=None):
+        with self._lock:
+            del self._inflight[key]
+            if error is None and self.ttl > 0:
+                if len(self._cache) >= self.max_entries:
+                    now = time.monotonic()
+                    self._cache = {k: v for k, v in self._cache.items() if v[0] > now}
+                    if len(self._cache) >= self.max_entries:
+                        self._cache.pop(next(iter(self._cache)))
+                self._cache[key] = (time.monotonic() + self.ttl, result)
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def _abandon(self, key, future):
+        # The computation was interrupted, not failed: waiting callers retry
+        with self._lock:
+            del self._inflight[key]
+        future.cancel()
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Thread entry point: returns fn(*args, **kwargs), shared with concurrent callers.
+        """
+        while True:
+            future, leader = self._claim(key)
+            if leader:
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    self._settle(key, future, error=e)
+                    raise
+                except BaseException:
+                    self._abandon(key, future)
+                    raise
+                self._settle(key, future, result)
+            try:
+                result = future.result()
+            except CancelledError:
+                if future.cancelled():
+                    continue
+                raise
+            return copy.deepcopy(result)
+
+    def _start(self, key, future, fn, args, kwargs):
+        """
+        Runs the computation in a task no caller owns, so cancelling the caller
+        that started it does not fail the others.
+        """
+        loop = asyncio.get_running_loop()
+        if asyncio.iscoroutinefunction(fn):
+            task = loop.create_task(fn(*args, **kwargs))
+        else:
+            task = loop.run_in_executor(None, functools.partial(fn, *args, **kwargs))
+        self._tasks.add(task)
+
+        def finish(task):
+            self._tasks.discard(task)
+            error = None if task.cancelled() else task.exception()
+            if task.cancelled() or (error is not None and not isinstance(error, Exception)):
+                self._abandon(key, future)
+            elif error is not None:
+                self._settle(key, future, error=error)
+            else:
+                self._settle(key, future, task.result())
+
+        task.add_done_callback(finish)
+
+    async def ado(self, key, fn, *args, **kwargs):
+        """
+        Asyncio entry point. A blocking fn runs in the loop's default executor;
+        a coroutine function runs as its own task.
+        """
+        while True:
+            future, leader = self._claim(key)
+            if leader:
+                self._start(key, future, fn, args, kwargs)
+            try:
+                # Shielded: a cancelled caller must not cancel the shared future
+                result = await asyncio.shield(asyncio.wrap_future(future))
+            except (asyncio.CancelledError, CancelledError):
+                if future.cancelled():
+                    continue
+                raise
+            return copy.deepcopy(result)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,16 @@
+import sys
+import os
+
+# Add project root for config access
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from server.config import *  # expects: embedding_model
+from utils.rag_utils import get_embeddings
+from utils.guidance_retrieval import GuidanceIndex, PASSAGE_VECTORS
+
+# Embeds every guidance, threshold and section text for the configured
+# embedding model (one batched call), so hybrid retrieval starts warm.
+index = GuidanceIndex()
+print(f"🔗 Embedding {len(index.texts_to_embed())} guidance texts with {embedding_model}...")
+index.embed_passages(get_embeddings, embedding_model)
+
+print(f"✅ Guidance passage vectors saved to: {PASSAGE_VECTORS}")